@@ -1,13 +1,273 @@
+const SEARCH_ICON = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M10.68 11.74a6 6 0 0 1-7.922-8.982 6 6 0 0 1 8.982 7.922l3.04 3.04a.749.749 0 0 1-.326 1.275.749.749 0 0 1-.734-.215ZM11.5 7a4.499 4.499 0 1 0-8.997 0A4.499 4.499 0 0 0 11.5 7Z"></path></svg>';
+const LOADING_ICON = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 9a1.5 1.5 0 1 0 0-3 1.5 1.5 0 0 0 0 3ZM1.5 9a1.5 1.5 0 1 0 0-3 1.5 1.5 0 0 0 0 3Zm13 0a1.5 1.5 0 1 0 0-3 1.5 1.5 0 0 0 0 3Z"></path></svg>';
+
+// 当前搜索结果的状态：卡片是虚拟渲染的，勾选和选中状态不能保存在DOM里
+const resultState = {
+    query: '',
+    projects: [],
+    selectedRepos: new Set(),
+    activeRepo: null
+};
+
+// 项目详情缓存：内存 + IndexedDB，按 (query, repo) 缓存，并用服务端的ETag重新验证
+const projectDetailsCache = {
+    FRESH_MS: 5 * 60 * 1000, // 这段时间内的缓存直接使用，不再请求服务端
+    memory: new Map(),
+    dbPromise: null,
+
+    key(query, repoName) {
+        return `${query}::${repoName}`;
+    },
+
+    openDb() {
+        if (!('indexedDB' in window)) {
+            return Promise.resolve(null);
+        }
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise(resolve => {
+                const request = indexedDB.open('gitsage', 1);
+                request.onupgradeneeded = () => request.result.createObjectStore('project_details');
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => resolve(null); // 隐私模式等情况下只用内存缓存
+            });
+        }
+        return this.dbPromise;
+    },
+
+    async get(query, repoName) {
+        const key = this.key(query, repoName);
+        let entry = this.memory.get(key);
+        if (!entry) {
+            const db = await this.openDb();
+            if (!db) return null;
+            entry = await new Promise(resolve => {
+                const request = db.transaction('project_details').objectStore('project_details').get(key);
+                request.onsuccess = () => resolve(request.result || null);
+                request.onerror = () => resolve(null);
+            });
+            if (!entry) return null;
+            this.memory.set(key, entry);
+        }
+        return { ...entry, fresh: Date.now() - entry.storedAt < this.FRESH_MS };
+    },
+
+    async set(query, repoName, data, etag) {
+        const key = this.key(query, repoName);
+        const entry = { data, etag, storedAt: Date.now() };
+        this.memory.set(key, entry);
+        const db = await this.openDb();
+        if (!db) return;
+        try {
+            db.transaction('project_details', 'readwrite').objectStore('project_details').put(entry, key);
+        } catch (e) {
+            console.warn('Failed to persist project details:', e);
+        }
+    },
+
+    // 服务端返回304时刷新缓存时间
+    touch(query, repoName) {
+        const entry = this.memory.get(this.key(query, repoName));
+        if (entry) {
+            this.set(query, repoName, entry.data, entry.etag);
+        }
+    }
+};
+
+// 等待后台任务完成并返回任务结果：优先用SSE接收进度（服务端定期关闭连接后，EventSource会带上
+// Last-Event-ID自动重连），浏览器不支持EventSource或连接失败时改为轮询任务状态
+function waitForJob(accepted, onProgress) {
+    return new Promise((resolve, reject) => {
+        const settle = job => {
+            if (job.status === 'succeeded') {
+                resolve(job.result);
+            } else {
+                reject(new Error(job.error || 'Job failed'));
+            }
+        };
+
+        const poll = async () => {
+            try {
+                const response = await fetch(accepted.status_url);
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                const job = await response.json();
+                if (job.status === 'succeeded' || job.status === 'failed') {
+                    settle(job);
+                    return;
+                }
+                const events = job.events || [];
+                if (onProgress && events.length) {
+                    onProgress(events[events.length - 1].message);
+                }
+                setTimeout(poll, 2000);
+            } catch (error) {
+                reject(error);
+            }
+        };
+
+        if (!('EventSource' in window)) {
+            poll();
+            return;
+        }
+        const source = new EventSource(accepted.events_url);
+        source.onmessage = event => {
+            if (onProgress) {
+                onProgress(JSON.parse(event.data).message);
+            }
+        };
+        source.addEventListener('done', event => {
+            source.close();
+            settle(JSON.parse(event.data));
+        });
+        source.onerror = () => {
+            // 连接被正常关闭时EventSource会自动重连，只有彻底失败时才改为轮询
+            if (source.readyState === EventSource.CLOSED) {
+                poll();
+            }
+        };
+    });
+}
+
+// 结果卡片模板：克隆后用textContent填充，避免每张卡片都解析一遍HTML
+const projectCardTemplate = document.createElement('template');
+projectCardTemplate.innerHTML = `
+    <div class="project-card">
+        <input type="checkbox" class="project-checkbox">
+        <div class="project-details-wrapper">
+            <div class="project-info-about-wrapper">
+                <div class="project-info">
+                    <h3><a target="_blank"></a></h3>
+                </div>
+                <div class="project-about"></div>
+            </div>
+            <div class="project-stats">
+                <p>
+                    <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Zm0 2.445L6.615 5.5a.75.75 0 0 1-.564.41l-3.097.45 2.24 2.184a.75.75 0 0 1 .216.664l-.528 3.084 2.769-1.456a.75.75 0 0 1 .698 0l2.77 1.456-.53-3.084a.75.75 0 0 1 .216-.664l2.24-2.183-3.096-.45a.75.75 0 0 1-.564-.41L8 2.694Z"></path></svg><span class="stat-stars"></span>
+                    </span>
+                    <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M5 5.372v.878c0 .414.336.75.75.75h4.5a.75.75 0 0 0 .75-.75v-.878a2.25 2.25 0 1 1 1.5 0v.878a2.25 2.25 0 0 1-2.25 2.25h-1.5v2.128a2.251 2.251 0 1 1-1.5 0V8.5h-1.5A2.25 2.25 0 0 1 3.5 6.25v-.878a2.25 2.25 0 1 1 1.5 0ZM5 3.25a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Zm6.75.75a.75.75 0 1 0 0-1.5.75.75 0 0 0 0 1.5Zm-3 8.75a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Z"></path></svg><span class="stat-forks"></span>
+                    </span>
+                    <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 2c1.981 0 3.671.992 4.933 2.078 1.27 1.091 2.187 2.345 2.637 3.023a1.62 1.62 0 0 1 0 1.798c-.45.678-1.367 1.932-2.637 3.023C11.67 13.008 9.981 14 8 14c-1.981 0-3.671-.992-4.933-2.078C1.797 10.83.88 9.576.43 8.898a1.62 1.62 0 0 1 0-1.798c.45-.677 1.367-1.931 2.637-3.022C4.33 2.992 6.019 2 8 2ZM1.679 7.932a.12.12 0 0 0 0 .136c.411.622 1.241 1.75 2.366 2.717C5.176 11.758 6.527 12.5 8 12.5c1.473 0 2.825-.742 3.955-1.715 1.124-.967 1.954-2.096 2.366-2.717a.12.12 0 0 0 0-.136c-.412-.621-1.242-1.75-2.366-2.717C10.824 4.242 9.473 3.5 8 3.5c-1.473 0-2.825.742-3.955 1.715-1.124.967-1.954 2.096-2.366 2.717ZM8 10a2 2 0 1 1-.001-3.999A2 2 0 0 1 8 10Z"></path></svg><span class="stat-watchers"></span>
+                    </span>
+                </p>
+            </div>
+        </div>
+    </div>
+`;
+
+function createProjectCard(project, index) {
+    const card = projectCardTemplate.content.firstElementChild.cloneNode(true);
+    const description = project.description || 'No description';
+    card.dataset.repo = project.repo_name;
+    card.style.top = `${index * RESULT_ROW_HEIGHT}px`;
+
+    const link = card.querySelector('.project-info a');
+    link.href = project.url;
+    link.textContent = project.repo_name || 'No title available';
+    card.querySelector('.project-about').textContent = description.length > 100 ? description.substring(0, 100) + '...' : description;
+    card.querySelector('.stat-stars').textContent = ` Stars ${project.stars || 0}`;
+    card.querySelector('.stat-forks').textContent = ` Forks ${project.forks || 0}`;
+    card.querySelector('.stat-watchers').textContent = ` Watchers ${project.watchers || 0}`;
+
+    card.querySelector('.project-checkbox').checked = resultState.selectedRepos.has(project.repo_name);
+    card.classList.toggle('selected', resultState.activeRepo === project.repo_name);
+    return card;
+}
+
+// 与 style.css 中 .results-container.virtualized .project-card 的高度+间距保持一致
+const RESULT_ROW_HEIGHT = 125;
+const RESULT_OVERSCAN = 4;
+
+// 虚拟列表：只渲染左侧面板可见范围内（加上少量缓冲）的卡片，滚动时按帧增量更新
+class VirtualResultList {
+    constructor(container, scrollRoot) {
+        this.container = container;
+        this.scrollRoot = scrollRoot;
+        this.items = [];
+        this.rendered = new Map(); // index -> card
+        this.frameRequested = false;
+        this.scrollRoot.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+
+    setItems(items) {
+        this.reset();
+        this.items = items;
+        this.container.classList.add('virtualized');
+        this.container.style.height = `${items.length * RESULT_ROW_HEIGHT}px`;
+        this.render();
+    }
+
+    reset() {
+        this.items = [];
+        this.rendered.clear();
+        this.container.classList.remove('virtualized');
+        this.container.style.height = '';
+        this.container.innerHTML = '';
+    }
+
+    scheduleRender() {
+        if (this.frameRequested || this.items.length === 0) return;
+        this.frameRequested = true;
+        requestAnimationFrame(() => {
+            this.frameRequested = false;
+            this.render();
+        });
+    }
+
+    render() {
+        const rootRect = this.scrollRoot.getBoundingClientRect();
+        const listRect = this.container.getBoundingClientRect();
+        const viewTop = rootRect.top - listRect.top;
+        const first = Math.max(0, Math.floor(viewTop / RESULT_ROW_HEIGHT) - RESULT_OVERSCAN);
+        const last = Math.min(this.items.length - 1, Math.ceil((viewTop + rootRect.height) / RESULT_ROW_HEIGHT) + RESULT_OVERSCAN);
+
+        // 回收可见范围外的卡片
+        for (const [index, card] of this.rendered) {
+            if (index < first || index > last) {
+                card.remove();
+                this.rendered.delete(index);
+            }
+        }
+
+        const fragment = document.createDocumentFragment();
+        for (let i = first; i <= last; i++) {
+            if (!this.rendered.has(i)) {
+                const card = createProjectCard(this.items[i], i);
+                this.rendered.set(i, card);
+                fragment.appendChild(card);
+            }
+        }
+        this.container.appendChild(fragment);
+    }
+
+    // 选中/勾选状态变化后同步已渲染的卡片
+    syncSelection() {
+        this.rendered.forEach(card => {
+            const repoName = card.dataset.repo;
+            card.querySelector('.project-checkbox').checked = resultState.selectedRepos.has(repoName);
+            card.classList.toggle('selected', resultState.activeRepo === repoName);
+        });
+    }
+}
+
+const resultsContainer = document.getElementById('results-container');
+const resultList = new VirtualResultList(resultsContainer, resultsContainer.closest('.left-panel') || document.scrollingElement);
+
 document.getElementById('search-button').addEventListener('click', async () => {
     const query = document.getElementById('search-input').value;
     if (!query) return;
 
     // 将搜索图标更改为省略号图标
     const searchButton = document.getElementById('search-button');
-    searchButton.innerHTML = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 9a1.5 1.5 0 1 0 0-3 1.5 1.5 0 0 0 0 3ZM1.5 9a1.5 1.5 0 1 0 0-3 1.5 1.5 0 0 0 0 3Zm13 0a1.5 1.5 0 1 0 0-3 1.5 1.5 0 0 0 0 3Z"></path></svg>';
+    searchButton.innerHTML = LOADING_ICON;
 
-    const resultsContainer = document.getElementById('results-container');
-    resultsContainer.innerHTML = ''; // 清空左侧卡片
+    resultList.reset(); // 清空左侧卡片
+    resultState.selectedRepos.clear();
+    resultState.activeRepo = null;
     document.getElementById('process-button').style.display = 'none';
     document.getElementById('final-output').innerHTML = '';
     
@@ -40,7 +300,7 @@ document.getElementById('search-button').addEventListener('click', async () => {
         const results = data.results || []; // Ensure results is an array
         
         // 搜索完成后，将图标变回搜索图标
-        searchButton.innerHTML = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M10.68 11.74a6 6 0 0 1-7.922-8.982 6 6 0 0 1 8.982 7.922l3.04 3.04a.749.749 0 0 1-.326 1.275.749.749 0 0 1-.734-.215ZM11.5 7a4.499 4.499 0 1 0-8.997 0A4.499 4.499 0 0 0 11.5 7Z"></path></svg>';
+        searchButton.innerHTML = SEARCH_ICON;
         if (results.length > 0) {
             // 显示右侧面板的标题和内容
             const detailsTitle = document.getElementById('project-details-title');
@@ -53,41 +313,11 @@ document.getElementById('search-button').addEventListener('click', async () => {
                 detailsContent.style.display = 'block';
                 detailsContent.innerHTML = 'Please select a project to view details.';
             }
-            
-            results.forEach(project => {
-                const card = document.createElement('div');
-                card.classList.add('project-card');
-        card.innerHTML = `
-            <input type="checkbox" class="project-checkbox">
-            <div class="project-details-wrapper"> <!-- New wrapper div -->
-                <div class="project-info-about-wrapper"> <!-- New wrapper for info and about -->
-                    <div class="project-info">
-                        <h3><a href="${project.url}" target="_blank">${project.repo_name || 'No title available'}</a></h3>
-                    </div>
-                    <div class="project-about">${(project.description || 'No description').length > 100 ? (project.description || 'No description').substring(0, 100) + '...' : (project.description || 'No description')}</div>
-                </div>
-                <div class="project-stats">
-                    <p>
-                        <span style="display: flex; align-items: center; gap: 6px;">
-                        <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Zm0 2.445L6.615 5.5a.75.75 0 0 1-.564.41l-3.097.45 2.24 2.184a.75.75 0 0 1 .216.664l-.528 3.084 2.769-1.456a.75.75 0 0 1 .698 0l2.77 1.456-.53-3.084a.75.75 0 0 1 .216-.664l2.24-2.183-3.096-.45a.75.75 0 0 1-.564-.41L8 2.694Z"></path></svg> Stars ${project.stars || 0}
-                        </span>
-                        <span style="display: flex; align-items: center; gap: 6px;">
-                        <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M5 5.372v.878c0 .414.336.75.75.75h4.5a.75.75 0 0 0 .75-.75v-.878a2.25 2.25 0 1 1 1.5 0v.878a2.25 2.25 0 0 1-2.25 2.25h-1.5v2.128a2.251 2.251 0 1 1-1.5 0V8.5h-1.5A2.25 2.25 0 0 1 3.5 6.25v-.878a2.25 2.25 0 1 1 1.5 0ZM5 3.25a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Zm6.75.75a.75.75 0 1 0 0-1.5.75.75 0 0 0 0 1.5Zm-3 8.75a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Z"></path></svg> Forks ${project.forks || 0}
-                        </span>
-                        <span style="display: flex; align-items: center; gap: 6px;">
-                        <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 2c1.981 0 3.671.992 4.933 2.078 1.27 1.091 2.187 2.345 2.637 3.023a1.62 1.62 0 0 1 0 1.798c-.45.678-1.367 1.932-2.637 3.023C11.67 13.008 9.981 14 8 14c-1.981 0-3.671-.992-4.933-2.078C1.797 10.83.88 9.576.43 8.898a1.62 1.62 0 0 1 0-1.798c.45-.677 1.367-1.931 2.637-3.022C4.33 2.992 6.019 2 8 2ZM1.679 7.932a.12.12 0 0 0 0 .136c.411.622 1.241 1.75 2.366 2.717C5.176 11.758 6.527 12.5 8 12.5c1.473 0 2.825-.742 3.955-1.715 1.124-.967 1.954-2.096 2.366-2.717a.12.12 0 0 0 0-.136c-.412-.621-1.242-1.75-2.366-2.717C10.824 4.242 9.473 3.5 8 3.5c-1.473 0-2.825.742-3.955 1.715-1.124.967-1.954 2.096-2.366 2.717ZM8 10a2 2 0 1 1-.001-3.999A2 2 0 0 1 8 10Z"></path></svg> Watchers ${project.watchers || 0}
-                        </span>
-                    </p>
-                </div>
-            </div>
-        `;
-                resultsContainer.appendChild(card);
-            });
-            document.getElementById('process-button').style.display = 'block';
-
-            // Add event listeners to newly created project cards
-            addProjectCardEventListeners();
 
+            resultState.query = query;
+            resultState.projects = results;
+            resultList.setItems(results);
+            document.getElementById('process-button').style.display = 'block';
         } else {
             resultsContainer.innerHTML = 'No results found.';
         }
@@ -97,7 +327,7 @@ document.getElementById('search-button').addEventListener('click', async () => {
         console.error('Search error:', error);
         
         // 发生错误时也将图标变回搜索图标
-        searchButton.innerHTML = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M10.68 11.74a6 6 0 0 1-7.922-8.982 6 6 0 0 1 8.982 7.922l3.04 3.04a.749.749 0 0 1-.326 1.275.749.749 0 0 1-.734-.215ZM11.5 7a4.499 4.499 0 1 0-8.997 0A4.499 4.499 0 0 0 11.5 7Z"></path></svg>';
+        searchButton.innerHTML = SEARCH_ICON;
     }
 });
 
@@ -108,326 +338,338 @@ document.getElementById('search-input').addEventListener('keypress', async (even
     }
 });
 
-// Function to add click listeners to project cards
-function addProjectCardEventListeners() {
-    let selectedProjectCard = null; // Keep track of the currently selected card
-
-    document.querySelectorAll('.project-card').forEach(card => {
-        // Add click listener to the card for showing details
-        card.addEventListener('click', async (event) => {
-            // Prevent clicking the stats from triggering the card click
-            if (event.target.closest('.project-stats')) {
-                return;
-            }
-            
-            // 如果点击的是复选框，不执行卡片的选择逻辑
-            if (event.target.classList.contains('project-checkbox')) {
-                return;
-            }
-
-            // Find the checkbox within the clicked card and toggle its checked state
-            const checkbox = card.querySelector('.project-checkbox');
-            if (checkbox) {
-                checkbox.checked = !checkbox.checked;
-            }
-
-            // Remove 'selected' class from the previously selected card
-            if (selectedProjectCard) {
-                selectedProjectCard.classList.remove('selected');
-            }
+// 卡片事件委托到结果容器上，虚拟列表回收/新建卡片时无需重新绑定
+resultsContainer.addEventListener('click', (event) => {
+    const card = event.target.closest('.project-card');
+    // Prevent clicking the stats from triggering the card click
+    if (!card || event.target.closest('.project-stats')) {
+        return;
+    }
+    const repoName = card.dataset.repo;
 
-            // Add 'selected' class to the clicked card
-            card.classList.add('selected');
-            selectedProjectCard = card; // Update the selected card
-
-            const projectLinkElement = card.querySelector('.project-info a');
-            const projectTitleElement = card.querySelector('.project-info h3 a'); // Get the title element
-            if (!projectLinkElement || !projectTitleElement) { // Check both elements
-                console.error('Project link or title element not found in card:', card);
-                const detailsContent = document.getElementById('project-details-content');
-                if (detailsContent) {
-                    detailsContent.innerHTML = 'Error: Could not find project link or title in the card.';
-                }
-                return;
-            }
-            const projectTitle = projectTitleElement.textContent; // Get the title text
-            
-            // 更新右侧面板标题显示项目名称
-            const detailsTitle = document.getElementById('project-details-title');
-            if (detailsTitle) {
-                detailsTitle.textContent = projectTitle;
-            }
+    // 点击复选框只切换勾选状态，不执行卡片的选择逻辑
+    if (event.target.classList.contains('project-checkbox')) {
+        if (event.target.checked) {
+            resultState.selectedRepos.add(repoName);
+        } else {
+            resultState.selectedRepos.delete(repoName);
+        }
+        return;
+    }
 
-            // Get the current search query from the input field
-            const currentQuery = document.getElementById('search-input').value; // Added to get query
+    // 点击卡片同时切换勾选状态，并设为当前选中的卡片
+    if (resultState.selectedRepos.has(repoName)) {
+        resultState.selectedRepos.delete(repoName);
+    } else {
+        resultState.selectedRepos.add(repoName);
+    }
+    resultState.activeRepo = repoName;
+    resultList.syncSelection();
 
-            const detailsContent = document.getElementById('project-details-content');
-            if (detailsContent) {
-                // 先清空右侧屏幕中之前的内容
-                detailsContent.innerHTML = '';
-                
-                // 显示加载指示器
-                const loadingDiv = document.createElement('div');
-                loadingDiv.className = 'loading-indicator';
-                loadingDiv.innerHTML = `
-                    <div class="spinner"></div>
-                    <p>Summarizing...</p>
-                `;
-                detailsContent.appendChild(loadingDiv);
-
-                // Fetch project details from the backend
-                try {
-                    const response = await fetch('/project_details', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify({ repo_name: projectTitle, query: currentQuery }) // Include query in the body
-                    });
-
-                    if (!response.ok) {
-                        let errorData;
-                        try {
-                            errorData = await response.json();
-                        } catch (e) {
-                            // If response is not JSON, use text
-                            const errorText = await response.text();
-                            throw new Error(errorText || `HTTP error! status: ${response.status}`);
-                        }
-                        throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
-                    }
+    showProjectDetails(resultState.query, repoName);
+});
 
-                    const projectDetails = await response.json();
-
-                    // Generate language bar and legend
-                    let languageHtml = '';
-                    const languages = projectDetails.languages; // Get language data
-                    console.log('Languages data:', languages);
-                    if (languages && Object.keys(languages).length > 0) {
-                        languageHtml += '<div class="language-container">';
-                        // Calculate total bytes
-                        const totalBytes = Object.values(languages).reduce((sum, bytes) => sum + bytes, 0);
-                        languageHtml += '<div class="language-bar">';
-                        // Sort languages by percentage descending for consistent display
-                        const sortedLanguages = Object.entries(languages)
-                            .map(([lang, bytes]) => [lang, (bytes / totalBytes) * 100]) // Calculate percentage
-                            .sort(([, a], [, b]) => b - a);
-                        // GitHub-like color palette (avoiding bright red and green)
-                        const githubColors = [
-                            '#3178c6', // TypeScript blue
-                            '#f1e05a', // JavaScript yellow
-                            '#e34c26', // HTML orange
-                            '#563d7c', // CSS purple
-                            '#384d54', // Docker blue-gray
-                            '#89e051', // Shell green (muted)
-                            '#701516', // Ruby dark red (muted)
-                            '#b07219', // Java brown
-                            '#2b7489', // Python blue
-                            '#00ADD8', // Go cyan
-                            '#512BD4', // C# purple
-                            '#A97BFF', // Kotlin purple
-                            '#DA5B0B', // Rust orange
-                            '#4F5D95'  // PHP blue
-                        ];
-                        sortedLanguages.forEach(([lang, percentage], index) => {
-                            const colorIndex = index % githubColors.length;
-                            const consistentColor = githubColors[colorIndex];
-                            languageHtml += `<div class="language-segment" style="width: ${percentage}%; background-color: ${consistentColor};" title="${lang}: ${percentage.toFixed(2)}%"></div>`;
-                        });
-                        languageHtml += '</div>'; // .language-bar
-                        languageHtml += '<div class="language-legend">';
-                        sortedLanguages.forEach(([lang, percentage], index) => {
-                             const colorIndex = index % githubColors.length;
-                             const consistentColor = githubColors[colorIndex];
-                             languageHtml += `<span class="legend-item"><span class="legend-color" style="background-color: ${consistentColor};"></span>${lang} ${percentage.toFixed(2)}%</span>`;
-                        });
-                        languageHtml += '</div>'; // .language-legend
-                        languageHtml += '</div>'; // .language-container
-                    }
+// Star History：鼠标移入/移出卡片的统计区域时更新图表
+resultsContainer.addEventListener('mouseover', (event) => {
+    const projectStats = event.target.closest('.project-stats');
+    const projectLinkElement = projectStats && projectStats.closest('.project-card').querySelector('.project-info a');
+    if (projectLinkElement) {
+        updateStarHistoryChart(projectLinkElement.href, true, event);
+    }
+});
 
-                    // Generate project basic info section
-                    const basicInfoHtml = `
-                        <div class="project-basic-info">
-                            <div style="display: flex; gap: 20px; flex-wrap: wrap;">
-                                <span style="display: flex; align-items: center; gap: 6px;">
-                                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Zm0 2.445L6.615 5.5a.75.75 0 0 1-.564.41l-3.097.45 2.24 2.184a.75.75 0 0 1 .216.664l-.528 3.084 2.769-1.456a.75.75 0 0 1 .698 0l2.77 1.456-.53-3.084a.75.75 0 0 1 .216-.664l2.24-2.183-3.096-.45a.75.75 0 0 1-.564-.41L8 2.694Z"></path></svg> <strong>Stars</strong> ${projectDetails.stars || 0}
-                                </span>
-                                <span style="display: flex; align-items: center; gap: 6px;">
-                                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M5 5.372v.878c0 .414.336.75.75.75h4.5a.75.75 0 0 0 .75-.75v-.878a2.25 2.25 0 1 1 1.5 0v.878a2.25 2.25 0 0 1-2.25 2.25h-1.5v2.128a2.251 2.251 0 1 1-1.5 0V8.5h-1.5A2.25 2.25 0 0 1 3.5 6.25v-.878a2.25 2.25 0 1 1 1.5 0ZM5 3.25a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Zm6.75.75a.75.75 0 1 0 0-1.5.75.75 0 0 0 0 1.5Zm-3 8.75a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Z"></path></svg> <strong>Forks</strong> ${projectDetails.forks || 0}
-                                </span>
-                                <span style="display: flex; align-items: center; gap: 6px;">
-                                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 2c1.981 0 3.671.992 4.933 2.078 1.27 1.091 2.187 2.345 2.637 3.023a1.62 1.62 0 0 1 0 1.798c-.45.678-1.367 1.932-2.637 3.023C11.67 13.008 9.981 14 8 14c-1.981 0-3.671-.992-4.933-2.078C1.797 10.83.88 9.576.43 8.898a1.62 1.62 0 0 1 0-1.798c.45-.677 1.367-1.931 2.637-3.022C4.33 2.992 6.019 2 8 2ZM1.679 7.932a.12.12 0 0 0 0 .136c.411.622 1.241 1.75 2.366 2.717C5.176 11.758 6.527 12.5 8 12.5c1.473 0 2.825-.742 3.955-1.715 1.124-.967 1.954-2.096 2.366-2.717a.12.12 0 0 0 0-.136c-.412-.621-1.242-1.75-2.366-2.717C10.824 4.242 9.473 3.5 8 3.5c-1.473 0-2.825.742-3.955 1.715-1.124.967-1.954 2.096-2.366 2.717ZM8 10a2 2 0 1 1-.001-3.999A2 2 0 0 1 8 10Z"></path></svg> <strong>Watchers</strong> ${projectDetails.watchers || 0}
-                                </span>
-                                <span style="display: flex; align-items: center; gap: 6px;">
-                                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 0a8 8 0 1 1 0 16A8 8 0 0 1 8 0ZM1.5 8a6.5 6.5 0 1 0 13 0 6.5 6.5 0 0 0-13 0Zm7.25-3.25v2.5h2.5a.75.75 0 0 1 0 1.5h-2.5v2.5a.75.75 0 0 1-1.5 0v-2.5h-2.5a.75.75 0 0 1 0-1.5h2.5v-2.5a.75.75 0 0 1 1.5 0Z"></path></svg> <strong>Created</strong> ${new Date(projectDetails.created_at).toLocaleDateString()}
-                                </span>
-                                <span style="display: flex; align-items: center; gap: 6px;">
-                                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M11.93 8.5a4.002 4.002 0 0 1-7.86 0H.75a.75.75 0 0 1 0-1.5h3.32a4.002 4.002 0 0 1 7.86 0h3.32a.75.75 0 0 1 0 1.5Zm-1.43-.75a2.5 2.5 0 1 0-5 0 2.5 2.5 0 0 0 5 0Z"></path></svg> <strong>Last Commit</strong> ${new Date(projectDetails.last_commit).toLocaleDateString()}
-                                </span>
-                            </div>
-                            <div class="info-row" style="margin-top: 20px; display: flex; align-items: center; gap: 8px;">
-                                <span class="info-label" style="display: flex; align-items: center; gap: 6px;">
-                                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M0 1.75A.75.75 0 0 1 .75 1h4.253c1.227 0 2.317.59 3 1.501A3.743 3.743 0 0 1 11.006 1h4.245a.75.75 0 0 1 .75.75v10.5a.75.75 0 0 1-.75.75h-4.507a2.25 2.25 0 0 0-1.591.659l-.622.621a.75.75 0 0 1-1.06 0l-.622-.621A2.25 2.25 0 0 0 5.258 13H.75a.75.75 0 0 1-.75-.75Zm7.251 10.324.004-5.073-.002-2.253A2.25 2.25 0 0 0 5.003 2.5H1.5v9h3.757a3.75 3.75 0 0 1 1.994.574ZM8.755 4.75l-.004 7.322a3.752 3.752 0 0 1 1.992-.572H14.5v-9h-3.495a2.25 2.25 0 0 0-2.25 2.25Z"></path></svg> <strong>Description:</strong>
-                                </span>
-                                <span class="info-value">${projectDetails.description || 'No description available'}</span>
-                            </div>
-                        </div>
-                    `;
-
-                    // Generate analysis result section
-                    let analysisHtml = '';
-                    if (projectDetails.analysis_result) {
-                        const analysis = projectDetails.analysis_result;
-                        analysisHtml = `
-                            <div class="analysis-section">
-                                <h3><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 8px;"><path d="M5.75 7.5a.75.75 0 0 1 .75.75v1.5a.75.75 0 0 1-1.5 0v-1.5a.75.75 0 0 1 .75-.75Zm5.25.75a.75.75 0 0 0-1.5 0v1.5a.75.75 0 0 0 1.5 0v-1.5Z"></path><path d="M6.25 0h2A.75.75 0 0 1 9 .75V3.5h3.25a2.25 2.25 0 0 1 2.25 2.25V8h.75a.75.75 0 0 1 0 1.5h-.75v2.75a2.25 2.25 0 0 1-2.25 2.25h-8.5a2.25 2.25 0 0 1-2.25-2.25V9.5H.75a.75.75 0 0 1 0-1.5h.75V5.75A2.25 2.25 0 0 1 3.75 3.5H7.5v-2H6.25a.75.75 0 0 1 0-1.5ZM3 5.75v6.5c0 .414.336.75.75.75h8.5a.75.75 0 0 0 .75-.75v-6.5a.75.75 0 0 0-.75-.75h-8.5a.75.75 0 0 0-.75.75Z"></path></svg>项目分析</h3>
-                                <div class="analysis-grid" style="display: flex; flex-wrap: wrap; gap: 20px;">
-                                    <div class="analysis-item">
-                                        <span class="analysis-label"><strong>活跃度评分:</strong></span>
-                                        <span class="analysis-score">${analysis.activity_score}/10</span>
-                                    </div>
-                                    <div class="analysis-item">
-                                        <span class="analysis-label"><strong>代码质量评分:</strong></span>
-                                        <span class="analysis-score">${analysis.code_quality_score}/10</span>
-                                    </div>
-                                    <div class="analysis-item">
-                                        <span class="analysis-label"><strong>复杂度等级:</strong></span>
-                                        <span class="analysis-value">${analysis.complexity_level}</span>
-                                    </div>
-                                    <div class="analysis-item">
-                                        <span class="analysis-label"><strong>维护状态:</strong></span>
-                                        <span class="analysis-value">${analysis.maintenance_status}</span>
-                                    </div>
-                                </div>
-                            </div>
-                        `;
-                    }
+resultsContainer.addEventListener('mouseout', (event) => {
+    const projectStats = event.target.closest('.project-stats');
+    const projectLinkElement = projectStats && projectStats.closest('.project-card').querySelector('.project-info a');
+    if (projectLinkElement) {
+        updateStarHistoryChart(projectLinkElement.href, false);
+    }
+});
 
-                    // Generate category result section
-                    let categoryHtml = '';
-                    if (projectDetails.category_result) {
-                        const category = projectDetails.category_result;
-                        categoryHtml = `
-                            <div class="category-section">
-                                <h3><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 8px;"><path d="M1 7.775V2.75C1 1.784 1.784 1 2.75 1h5.025c.464 0 .91.184 1.238.513l6.25 6.25a1.75 1.75 0 0 1 0 2.474l-5.026 5.026a1.75 1.75 0 0 1-2.474 0l-6.25-6.25A1.752 1.752 0 0 1 1 7.775Zm1.5 0c0 .066.026.13.073.177l6.25 6.25a.25.25 0 0 0 .354 0l5.025-5.025a.25.25 0 0 0 0-.354l-6.25-6.25a.25.25 0 0 0-.177-.073H2.75a.25.25 0 0 0-.25.25ZM6 5a1 1 0 1 1 0 2 1 1 0 0 1 0-2Z"></path></svg>项目分类</h3>
-                                <div class="category-content" style="display: flex; flex-wrap: wrap; gap: 20px; align-items: flex-start;">
-                                    <div class="category-item">
-                                        <span class="category-label"><strong>主要分类:</strong></span>
-                                        <span class="primary-category">${category.primary_category}</span>
-                                    </div>
-                                    ${category.secondary_categories && category.secondary_categories.length > 0 ? `
-                                        <div class="category-item">
-                                            <div style="display: flex; align-items: center; gap: 8px;">
-                                                <span class="category-label"><strong>次要分类:</strong></span>
-                                                <div class="secondary-categories" style="display: flex; flex-wrap: nowrap; gap: 8px; overflow-x: auto;">
-                                                    ${category.secondary_categories.map(cat => `<span class="category-tag">${cat}</span>`).join('')}
-                                                </div>
-                                            </div>
-                                        </div>
-                                    ` : ''}
-                                    ${category.tags && category.tags.length > 0 ? `
-                                        <div class="category-item">
-                                            <span class="category-label">
-                                                <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 4px;"><path d="M7.22 6.5a.72.72 0 1 1-1.44 0 .72.72 0 0 1 1.44 0Z"></path><path d="M8 16A8 8 0 1 1 8 0a8 8 0 0 1 0 16ZM4 5v3.38c.001.397.159.778.44 1.059l3.211 3.213a1.202 1.202 0 0 0 1.698 0l3.303-3.303a1.202 1.202 0 0 0 0-1.698L9.439 4.44A1.5 1.5 0 0 0 8.379 4H5a1 1 0 0 0-1 1Z"></path></svg>
-                                                <strong>标签:</strong>
-                                            </span>
-                                            <div class="tags" style="display: flex; flex-wrap: wrap; gap: 8px; margin-top: 4px;">
-                                                ${category.tags.map(tag => `<span class="tag" style="padding: 4px 8px; border: 1px solid #ddd; border-radius: 4px; background-color: #1976d2; color: white; font-weight: bold; font-size: 12px;">${tag}</span>`).join('')}
-                                            </div>
-                                        </div>
-                                    ` : ''}
-                                </div>
-                            </div>
-                        `;
-                    }
+// 显示项目详情：命中缓存时立即渲染，缓存过期则带 If-None-Match 在后台重新验证
+async function showProjectDetails(query, repoName) {
+    // 更新右侧面板标题显示项目名称
+    const detailsTitle = document.getElementById('project-details-title');
+    if (detailsTitle) {
+        detailsTitle.textContent = repoName;
+    }
+    const detailsContent = document.getElementById('project-details-content');
+    if (!detailsContent) return;
 
-                    // Generate report result section
-                    let reportHtml = '';
-                    if (projectDetails.report_result) {
-                        const report = projectDetails.report_result;
-                        reportHtml = `
-                            <div class="report-section">
-                                <h3><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 8px;"><path d="M4.75 7a.75.75 0 0 0 0 1.5h4.5a.75.75 0 0 0 0-1.5h-4.5ZM5 4.75A.75.75 0 0 1 5.75 4h5.5a.75.75 0 0 1 0 1.5h-5.5A.75.75 0 0 1 5 4.75ZM6.75 10a.75.75 0 0 0 0 1.5h4.5a.75.75 0 0 0 0-1.5h-4.5Z"></path><path d="M0 1.75C0 .784.784 0 1.75 0h12.5C15.216 0 16 .784 16 1.75v12.5A1.75 1.75 0 0 1 14.25 16H1.75A1.75 1.75 0 0 1 0 14.25Zm1.75-.25a.25.25 0 0 0-.25.25v12.5c0 .138.112.25.25.25h12.5a.25.25 0 0 0 .25-.25V1.75a.25.25 0 0 0-.25-.25Z"></path></svg>AI 分析报告</h3>
-                                <div class="report-content">
-                                    <div class="rating">
-                                        <span class="rating-label"><strong>推荐评级:</strong></span>
-                                        <span class="rating-stars">${(() => {
-                                            const starCount = (report.rating.match(/⭐️/g) || []).length;
-                                            const filledStar = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="margin-right: 2px;"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Z"></path></svg>';
-                                            const emptyStar = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="margin-right: 2px;"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Zm0 2.445L6.615 5.5a.75.75 0 0 1-.564.41l-3.097.45 2.24 2.184a.75.75 0 0 1 .216.664l-.528 3.084 2.769-1.456a.75.75 0 0 1 .698 0l2.77 1.456-.53-3.084a.75.75 0 0 1 .216-.664l2.24-2.183-3.096-.45a.75.75 0 0 1-.564-.41L8 2.694Z"></path></svg>';
-                                            return filledStar.repeat(starCount) + emptyStar.repeat(5 - starCount);
-                                        })()}</span>
-                                    </div>
-                                    <div class="summary">
-                                        <h4>项目总结</h4>
-                                        <p>${report.summary}</p>
-                                    </div>
-                                    <div class="recommendation">
-                                        <h4>推荐理由</h4>
-                                        <p>${report.recommendation_reason}</p>
-                                    </div>
-                                </div>
-                            </div>
-                        `;
-                    }
+    const cached = await projectDetailsCache.get(query, repoName);
+    if (resultState.activeRepo !== repoName) return;
+    if (cached) {
+        renderProjectDetails(detailsContent, cached.data);
+        if (cached.fresh) return;
+    } else {
+        // 先用搜索结果和本地评分渲染速览，再在下方显示加载指示器
+        const project = resultState.projects.find(item => item.repo_name === repoName);
+        if (project && project.quick_scores) {
+            renderProjectDetails(detailsContent, {
+                ...project,
+                analysis_result: { ...project.quick_scores, complexity_level: '分析中...' }
+            });
+        } else {
+            detailsContent.innerHTML = '';
+        }
+        detailsContent.insertAdjacentHTML('beforeend', `
+            <div class="loading-indicator">
+                <div class="spinner"></div>
+                <p>Summarizing...</p>
+            </div>
+        `);
+    }
 
-                    detailsContent.innerHTML = `
-                        ${basicInfoHtml}
-                        ${languageHtml}
-                        ${analysisHtml ? '<hr class="section-divider">' + analysisHtml : ''}
-                        ${categoryHtml ? '<hr class="section-divider">' + categoryHtml : ''}
-                        ${reportHtml ? '<hr class="section-divider">' + reportHtml : ''}
-                    `;
-                } catch (error) {
-                    detailsContent.innerHTML = `Error loading project details: ${error.message || 'An unknown error occurred.'}`;
-                    console.error('Project details fetch error:', error);
-                }
-            }
+    try {
+        const headers = { 'Content-Type': 'application/json' };
+        if (cached && cached.etag) {
+            headers['If-None-Match'] = cached.etag;
+        }
+        // 需要分析时服务端返回202和任务地址，不会让请求一直挂起到分析结束
+        const response = await fetch('/project_details', {
+            method: 'POST',
+            headers: headers,
+            body: JSON.stringify({ repo_name: repoName, query: query, async: true })
         });
 
-        // 为复选框添加单独的点击事件监听器
-        const checkbox = card.querySelector('.project-checkbox');
-        if (checkbox) {
-            checkbox.addEventListener('click', (event) => {
-                // 阻止事件冒泡，防止触发卡片的点击事件
-                event.stopPropagation();
-                // 复选框状态在点击时已自动切换，无需手动切换
-            });
+        if (response.status === 304) {
+            projectDetailsCache.touch(query, repoName);
+            return;
+        }
+        if (!response.ok) {
+            let errorData;
+            try {
+                errorData = await response.json();
+            } catch (e) {
+                // If response is not JSON, use text
+                const errorText = await response.text();
+                throw new Error(errorText || `HTTP error! status: ${response.status}`);
+            }
+            throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
         }
 
-        // Add mouseover and mouseout listeners to the project stats for Star History
-        const projectStats = card.querySelector('.project-stats');
-        if (projectStats) {
-            projectStats.addEventListener('mouseover', (event) => {
-                const projectLinkElement = card.querySelector('.project-info a');
-                if (projectLinkElement) {
-                    // Add the current project to the Star History chart, passing the event object
-                    updateStarHistoryChart(projectLinkElement.href, true, event);
+        let projectDetails;
+        let etag = null;
+        if (response.status === 202) {
+            projectDetails = await waitForJob(await response.json(), message => {
+                const status = detailsContent.querySelector('.loading-indicator p');
+                if (status && resultState.activeRepo === repoName) {
+                    status.textContent = message;
                 }
             });
-
-            projectStats.addEventListener('mouseout', (event) => {
-                 const projectLinkElement = card.querySelector('.project-info a');
-                 if (projectLinkElement) {
-                     // Remove the current project from the Star History chart
-                     updateStarHistoryChart(projectLinkElement.href, false);
-                 }
-            });
+        } else {
+            projectDetails = await response.json();
+            etag = response.headers.get('ETag');
         }
-    });
+        if (projectDetails.analysis_result) {
+            projectDetailsCache.set(query, repoName, projectDetails, etag);
+        }
+        // 请求期间用户可能已经切换到其他卡片
+        if (resultState.activeRepo === repoName) {
+            renderProjectDetails(detailsContent, projectDetails);
+        }
+    } catch (error) {
+        if (cached) {
+            console.warn('Project details revalidation failed, showing cached data:', error);
+        } else if (resultState.activeRepo === repoName) {
+            detailsContent.innerHTML = `Error loading project details: ${error.message || 'An unknown error occurred.'}`;
+            console.error('Project details fetch error:', error);
+        }
+    }
 }
 
-// Initial call for any cards present on page load (if any)
-addProjectCardEventListeners();
+function renderProjectDetails(detailsContent, projectDetails) {
+    // Generate language bar and legend
+    let languageHtml = '';
+    const languages = projectDetails.languages; // Get language data
+    console.log('Languages data:', languages);
+    if (languages && Object.keys(languages).length > 0) {
+        languageHtml += '<div class="language-container">';
+        // Calculate total bytes
+        const totalBytes = Object.values(languages).reduce((sum, bytes) => sum + bytes, 0);
+        languageHtml += '<div class="language-bar">';
+        // Sort languages by percentage descending for consistent display
+        const sortedLanguages = Object.entries(languages)
+            .map(([lang, bytes]) => [lang, (bytes / totalBytes) * 100]) // Calculate percentage
+            .sort(([, a], [, b]) => b - a);
+        // GitHub-like color palette (avoiding bright red and green)
+        const githubColors = [
+            '#3178c6', // TypeScript blue
+            '#f1e05a', // JavaScript yellow
+            '#e34c26', // HTML orange
+            '#563d7c', // CSS purple
+            '#384d54', // Docker blue-gray
+            '#89e051', // Shell green (muted)
+            '#701516', // Ruby dark red (muted)
+            '#b07219', // Java brown
+            '#2b7489', // Python blue
+            '#00ADD8', // Go cyan
+            '#512BD4', // C# purple
+            '#A97BFF', // Kotlin purple
+            '#DA5B0B', // Rust orange
+            '#4F5D95'  // PHP blue
+        ];
+        sortedLanguages.forEach(([lang, percentage], index) => {
+            const colorIndex = index % githubColors.length;
+            const consistentColor = githubColors[colorIndex];
+            languageHtml += `<div class="language-segment" style="width: ${percentage}%; background-color: ${consistentColor};" title="${lang}: ${percentage.toFixed(2)}%"></div>`;
+        });
+        languageHtml += '</div>'; // .language-bar
+        languageHtml += '<div class="language-legend">';
+        sortedLanguages.forEach(([lang, percentage], index) => {
+             const colorIndex = index % githubColors.length;
+             const consistentColor = githubColors[colorIndex];
+             languageHtml += `<span class="legend-item"><span class="legend-color" style="background-color: ${consistentColor};"></span>${lang} ${percentage.toFixed(2)}%</span>`;
+        });
+        languageHtml += '</div>'; // .language-legend
+        languageHtml += '</div>'; // .language-container
+    }
+
+    // Generate project basic info section
+    const basicInfoHtml = `
+        <div class="project-basic-info">
+            <div style="display: flex; gap: 20px; flex-wrap: wrap;">
+                <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Zm0 2.445L6.615 5.5a.75.75 0 0 1-.564.41l-3.097.45 2.24 2.184a.75.75 0 0 1 .216.664l-.528 3.084 2.769-1.456a.75.75 0 0 1 .698 0l2.77 1.456-.53-3.084a.75.75 0 0 1 .216-.664l2.24-2.183-3.096-.45a.75.75 0 0 1-.564-.41L8 2.694Z"></path></svg> <strong>Stars</strong> ${projectDetails.stars || 0}
+                </span>
+                <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M5 5.372v.878c0 .414.336.75.75.75h4.5a.75.75 0 0 0 .75-.75v-.878a2.25 2.25 0 1 1 1.5 0v.878a2.25 2.25 0 0 1-2.25 2.25h-1.5v2.128a2.251 2.251 0 1 1-1.5 0V8.5h-1.5A2.25 2.25 0 0 1 3.5 6.25v-.878a2.25 2.25 0 1 1 1.5 0ZM5 3.25a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Zm6.75.75a.75.75 0 1 0 0-1.5.75.75 0 0 0 0 1.5Zm-3 8.75a.75.75 0 1 0-1.5 0 .75.75 0 0 0 1.5 0Z"></path></svg> <strong>Forks</strong> ${projectDetails.forks || 0}
+                </span>
+                <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 2c1.981 0 3.671.992 4.933 2.078 1.27 1.091 2.187 2.345 2.637 3.023a1.62 1.62 0 0 1 0 1.798c-.45.678-1.367 1.932-2.637 3.023C11.67 13.008 9.981 14 8 14c-1.981 0-3.671-.992-4.933-2.078C1.797 10.83.88 9.576.43 8.898a1.62 1.62 0 0 1 0-1.798c.45-.677 1.367-1.931 2.637-3.022C4.33 2.992 6.019 2 8 2ZM1.679 7.932a.12.12 0 0 0 0 .136c.411.622 1.241 1.75 2.366 2.717C5.176 11.758 6.527 12.5 8 12.5c1.473 0 2.825-.742 3.955-1.715 1.124-.967 1.954-2.096 2.366-2.717a.12.12 0 0 0 0-.136c-.412-.621-1.242-1.75-2.366-2.717C10.824 4.242 9.473 3.5 8 3.5c-1.473 0-2.825.742-3.955 1.715-1.124.967-1.954 2.096-2.366 2.717ZM8 10a2 2 0 1 1-.001-3.999A2 2 0 0 1 8 10Z"></path></svg> <strong>Watchers</strong> ${projectDetails.watchers || 0}
+                </span>
+                <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M8 0a8 8 0 1 1 0 16A8 8 0 0 1 8 0ZM1.5 8a6.5 6.5 0 1 0 13 0 6.5 6.5 0 0 0-13 0Zm7.25-3.25v2.5h2.5a.75.75 0 0 1 0 1.5h-2.5v2.5a.75.75 0 0 1-1.5 0v-2.5h-2.5a.75.75 0 0 1 0-1.5h2.5v-2.5a.75.75 0 0 1 1.5 0Z"></path></svg> <strong>Created</strong> ${new Date(projectDetails.created_at).toLocaleDateString()}
+                </span>
+                <span style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M11.93 8.5a4.002 4.002 0 0 1-7.86 0H.75a.75.75 0 0 1 0-1.5h3.32a4.002 4.002 0 0 1 7.86 0h3.32a.75.75 0 0 1 0 1.5Zm-1.43-.75a2.5 2.5 0 1 0-5 0 2.5 2.5 0 0 0 5 0Z"></path></svg> <strong>Last Commit</strong> ${new Date(projectDetails.last_commit).toLocaleDateString()}
+                </span>
+            </div>
+            <div class="info-row" style="margin-top: 20px; display: flex; align-items: center; gap: 8px;">
+                <span class="info-label" style="display: flex; align-items: center; gap: 6px;">
+                    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16"><path d="M0 1.75A.75.75 0 0 1 .75 1h4.253c1.227 0 2.317.59 3 1.501A3.743 3.743 0 0 1 11.006 1h4.245a.75.75 0 0 1 .75.75v10.5a.75.75 0 0 1-.75.75h-4.507a2.25 2.25 0 0 0-1.591.659l-.622.621a.75.75 0 0 1-1.06 0l-.622-.621A2.25 2.25 0 0 0 5.258 13H.75a.75.75 0 0 1-.75-.75Zm7.251 10.324.004-5.073-.002-2.253A2.25 2.25 0 0 0 5.003 2.5H1.5v9h3.757a3.75 3.75 0 0 1 1.994.574ZM8.755 4.75l-.004 7.322a3.752 3.752 0 0 1 1.992-.572H14.5v-9h-3.495a2.25 2.25 0 0 0-2.25 2.25Z"></path></svg> <strong>Description:</strong>
+                </span>
+                <span class="info-value">${projectDetails.description || 'No description available'}</span>
+            </div>
+        </div>
+    `;
+
+    // Generate analysis result section
+    let analysisHtml = '';
+    if (projectDetails.analysis_result) {
+        const analysis = projectDetails.analysis_result;
+        analysisHtml = `
+            <div class="analysis-section">
+                <h3><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 8px;"><path d="M5.75 7.5a.75.75 0 0 1 .75.75v1.5a.75.75 0 0 1-1.5 0v-1.5a.75.75 0 0 1 .75-.75Zm5.25.75a.75.75 0 0 0-1.5 0v1.5a.75.75 0 0 0 1.5 0v-1.5Z"></path><path d="M6.25 0h2A.75.75 0 0 1 9 .75V3.5h3.25a2.25 2.25 0 0 1 2.25 2.25V8h.75a.75.75 0 0 1 0 1.5h-.75v2.75a2.25 2.25 0 0 1-2.25 2.25h-8.5a2.25 2.25 0 0 1-2.25-2.25V9.5H.75a.75.75 0 0 1 0-1.5h.75V5.75A2.25 2.25 0 0 1 3.75 3.5H7.5v-2H6.25a.75.75 0 0 1 0-1.5ZM3 5.75v6.5c0 .414.336.75.75.75h8.5a.75.75 0 0 0 .75-.75v-6.5a.75.75 0 0 0-.75-.75h-8.5a.75.75 0 0 0-.75.75Z"></path></svg>项目分析</h3>
+                <div class="analysis-grid" style="display: flex; flex-wrap: wrap; gap: 20px;">
+                    <div class="analysis-item">
+                        <span class="analysis-label"><strong>活跃度评分:</strong></span>
+                        <span class="analysis-score">${analysis.activity_score}/10</span>
+                    </div>
+                    <div class="analysis-item">
+                        <span class="analysis-label"><strong>代码质量评分:</strong></span>
+                        <span class="analysis-score">${analysis.code_quality_score}/10</span>
+                    </div>
+                    <div class="analysis-item">
+                        <span class="analysis-label"><strong>复杂度等级:</strong></span>
+                        <span class="analysis-value">${analysis.complexity_level}</span>
+                    </div>
+                    <div class="analysis-item">
+                        <span class="analysis-label"><strong>维护状态:</strong></span>
+                        <span class="analysis-value">${analysis.maintenance_status}</span>
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Generate category result section
+    let categoryHtml = '';
+    if (projectDetails.category_result) {
+        const category = projectDetails.category_result;
+        categoryHtml = `
+            <div class="category-section">
+                <h3><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 8px;"><path d="M1 7.775V2.75C1 1.784 1.784 1 2.75 1h5.025c.464 0 .91.184 1.238.513l6.25 6.25a1.75 1.75 0 0 1 0 2.474l-5.026 5.026a1.75 1.75 0 0 1-2.474 0l-6.25-6.25A1.752 1.752 0 0 1 1 7.775Zm1.5 0c0 .066.026.13.073.177l6.25 6.25a.25.25 0 0 0 .354 0l5.025-5.025a.25.25 0 0 0 0-.354l-6.25-6.25a.25.25 0 0 0-.177-.073H2.75a.25.25 0 0 0-.25.25ZM6 5a1 1 0 1 1 0 2 1 1 0 0 1 0-2Z"></path></svg>项目分类</h3>
+                <div class="category-content" style="display: flex; flex-wrap: wrap; gap: 20px; align-items: flex-start;">
+                    <div class="category-item">
+                        <span class="category-label"><strong>主要分类:</strong></span>
+                        <span class="primary-category">${category.primary_category}</span>
+                    </div>
+                    ${category.secondary_categories && category.secondary_categories.length > 0 ? `
+                        <div class="category-item">
+                            <div style="display: flex; align-items: center; gap: 8px;">
+                                <span class="category-label"><strong>次要分类:</strong></span>
+                                <div class="secondary-categories" style="display: flex; flex-wrap: nowrap; gap: 8px; overflow-x: auto;">
+                                    ${category.secondary_categories.map(cat => `<span class="category-tag">${cat}</span>`).join('')}
+                                </div>
+                            </div>
+                        </div>
+                    ` : ''}
+                    ${category.tags && category.tags.length > 0 ? `
+                        <div class="category-item">
+                            <span class="category-label">
+                                <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 4px;"><path d="M7.22 6.5a.72.72 0 1 1-1.44 0 .72.72 0 0 1 1.44 0Z"></path><path d="M8 16A8 8 0 1 1 8 0a8 8 0 0 1 0 16ZM4 5v3.38c.001.397.159.778.44 1.059l3.211 3.213a1.202 1.202 0 0 0 1.698 0l3.303-3.303a1.202 1.202 0 0 0 0-1.698L9.439 4.44A1.5 1.5 0 0 0 8.379 4H5a1 1 0 0 0-1 1Z"></path></svg>
+                                <strong>标签:</strong>
+                            </span>
+                            <div class="tags" style="display: flex; flex-wrap: wrap; gap: 8px; margin-top: 4px;">
+                                ${category.tags.map(tag => `<span class="tag" style="padding: 4px 8px; border: 1px solid #ddd; border-radius: 4px; background-color: #1976d2; color: white; font-weight: bold; font-size: 12px;">${tag}</span>`).join('')}
+                            </div>
+                        </div>
+                    ` : ''}
+                </div>
+            </div>
+        `;
+    }
+
+    // Generate report result section
+    let reportHtml = '';
+    if (projectDetails.report_result) {
+        const report = projectDetails.report_result;
+        reportHtml = `
+            <div class="report-section">
+                <h3><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="vertical-align: middle; margin-right: 8px;"><path d="M4.75 7a.75.75 0 0 0 0 1.5h4.5a.75.75 0 0 0 0-1.5h-4.5ZM5 4.75A.75.75 0 0 1 5.75 4h5.5a.75.75 0 0 1 0 1.5h-5.5A.75.75 0 0 1 5 4.75ZM6.75 10a.75.75 0 0 0 0 1.5h4.5a.75.75 0 0 0 0-1.5h-4.5Z"></path><path d="M0 1.75C0 .784.784 0 1.75 0h12.5C15.216 0 16 .784 16 1.75v12.5A1.75 1.75 0 0 1 14.25 16H1.75A1.75 1.75 0 0 1 0 14.25Zm1.75-.25a.25.25 0 0 0-.25.25v12.5c0 .138.112.25.25.25h12.5a.25.25 0 0 0 .25-.25V1.75a.25.25 0 0 0-.25-.25Z"></path></svg>AI 分析报告</h3>
+                <div class="report-content">
+                    <div class="rating">
+                        <span class="rating-label"><strong>推荐评级:</strong></span>
+                        <span class="rating-stars">${(() => {
+                            const starCount = (report.rating.match(/⭐️/g) || []).length;
+                            const filledStar = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="margin-right: 2px;"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Z"></path></svg>';
+                            const emptyStar = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" width="16" height="16" style="margin-right: 2px;"><path d="M8 .25a.75.75 0 0 1 .673.418l1.882 3.815 4.21.612a.75.75 0 0 1 .416 1.279l-3.046 2.97.719 4.192a.751.751 0 0 1-1.088.791L8 12.347l-3.766 1.98a.75.75 0 0 1-1.088-.79l.72-4.194L.818 6.374a.75.75 0 0 1 .416-1.28l4.21-.611L7.327.668A.75.75 0 0 1 8 .25Zm0 2.445L6.615 5.5a.75.75 0 0 1-.564.41l-3.097.45 2.24 2.184a.75.75 0 0 1 .216.664l-.528 3.084 2.769-1.456a.75.75 0 0 1 .698 0l2.77 1.456-.53-3.084a.75.75 0 0 1 .216-.664l2.24-2.183-3.096-.45a.75.75 0 0 1-.564-.41L8 2.694Z"></path></svg>';
+                            return filledStar.repeat(starCount) + emptyStar.repeat(5 - starCount);
+                        })()}</span>
+                    </div>
+                    <div class="summary">
+                        <h4>项目总结</h4>
+                        <p>${report.summary}</p>
+                    </div>
+                    <div class="recommendation">
+                        <h4>推荐理由</h4>
+                        <p>${report.recommendation_reason}</p>
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    detailsContent.innerHTML = `
+        ${basicInfoHtml}
+        ${languageHtml}
+        ${analysisHtml ? '<hr class="section-divider">' + analysisHtml : ''}
+        ${categoryHtml ? '<hr class="section-divider">' + categoryHtml : ''}
+        ${reportHtml ? '<hr class="section-divider">' + reportHtml : ''}
+    `;
+}
 
     // Build Report functionality
     document.getElementById('process-button').addEventListener('click', async () => {
-        // Get all checked checkboxes
-        const checkboxes = document.querySelectorAll('.project-card input[type="checkbox"]:checked');
+        // 勾选状态保存在 resultState 中（不在可见范围内的卡片没有DOM），按搜索结果顺序取出
+        const selectedProjects = resultState.projects
+            .map(project => project.repo_name)
+            .filter(repoName => resultState.selectedRepos.has(repoName));
         
         const finalOutputContainer = document.getElementById('final-output');
         
-        if (checkboxes.length === 0) {
+        if (selectedProjects.length === 0) {
             finalOutputContainer.innerHTML = 'No projects selected.';
             finalOutputContainer.style.display = 'block';
             return;
@@ -451,14 +693,6 @@ addProjectCardEventListeners();
         finalOutputContainer.style.display = 'block';
         
         try {
-            // Get selected project names
-            const selectedProjects = [];
-            checkboxes.forEach(checkbox => {
-                const card = checkbox.closest('.project-card');
-                const projectTitle = card.querySelector('.project-info h3 a').textContent;
-                selectedProjects.push(projectTitle);
-            });
-            
             // Call backend to generate report
             const response = await fetch('/generate_report', {
                 method: 'POST',
@@ -467,7 +701,8 @@ addProjectCardEventListeners();
                 },
                 body: JSON.stringify({ 
                     query: currentQuery,
-                    selected_projects: selectedProjects
+                    selected_projects: selectedProjects,
+                    async: true
                 })
             });
             
@@ -476,7 +711,17 @@ addProjectCardEventListeners();
                 throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
             }
             
-            const result = await response.json();
+            let result;
+            if (response.status === 202) {
+                result = await waitForJob(await response.json(), message => {
+                    const status = finalOutputContainer.querySelector('.loading-indicator p');
+                    if (status) {
+                        status.textContent = message;
+                    }
+                });
+            } else {
+                result = await response.json();
+            }
             
             // Display success message with download button
             finalOutputContainer.innerHTML = `
@@ -0,0 +1,16 @@
+"""gunicorn 配置: gunicorn -c gunicorn.conf.py main:app"""
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5001')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+# gthread: 每个worker用线程池处理请求，SSE进度流和同步的长请求只占用一个线程，不会占满整个worker
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+# gthread worker按主循环的心跳判断超时，在线程池中执行的长请求不会因此被杀掉（连同worker中的任务线程）
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+
+def post_fork(server, worker):
+    """每个worker进程fork后启动任务队列的后台线程（master中启动的线程不会被fork继承）"""
+    from main import start_job_workers
+    start_job_workers()
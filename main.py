@@ -1,15 +1,150 @@
 import os
 import json
-import asyncio
+import math
+import time
+import hashlib
+import threading
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from dotenv import load_dotenv
-from src.multi_agent_system import MultiAgentSystem
+
+# 先加载 .env：下面的模块级配置（SHARED_STORE_DIR、PROFILE_DIR、PROFILING_TOKEN、JOB_*）都在导入时读取
+load_dotenv()
+
+from src.shared_state import SharedStore
+from src.job_queue import JobQueue, TERMINAL_STATUSES
+from src.profiling import StackSampler, run_coroutine, write_flamegraph
 
 app = Flask(__name__, static_folder='app')
 
-# 初始化多智能体系统
-multi_agent_system = MultiAgentSystem()
+# 共享存储：多个worker进程（或挂载同一目录的多台机器）共用项目记录
+store = SharedStore()
+
+# 多智能体系统在第一次请求时才构建，避免导入langchain等重量级依赖拖慢启动
+multi_agent_system = None
+_multi_agent_system_lock = threading.Lock()
+
+def get_multi_agent_system():
+    """获取（必要时延迟初始化）多智能体系统"""
+    global multi_agent_system
+    if multi_agent_system is None:
+        with _multi_agent_system_lock:
+            if multi_agent_system is None:
+                from src.multi_agent_system import MultiAgentSystem
+                multi_agent_system = MultiAgentSystem()
+    return multi_agent_system
+
+# 长耗时的分析和报告可以作为后台任务执行，请求线程立即返回任务ID
+job_queue = None
+_job_queue_lock = threading.Lock()
+
+async def _run_project_details_job(payload, progress):
+    """任务: 分析单个项目"""
+    query = payload.get('query', '')
+    repo_name = payload['repo_name']
+    cached_data = store.read_json(store.project_path(query, repo_name))
+    if cached_data is None:
+        raise Exception(f"Project not found in cache: {repo_name}")
+    return await get_multi_agent_system().process_selected_project(query, cached_data, progress)
+
+async def _run_generate_report_job(payload, progress):
+    """任务: 生成汇总报告"""
+    result = await get_multi_agent_system().generate_summary_report(
+        payload['query'], payload['selected_projects'], progress)
+    return {
+        'success': True,
+        'message': 'Report generated successfully',
+        'report_path': result.get('report_path', ''),
+        'summary': result.get('summary', '')
+    }
+
+async def _run_batch_search_job(payload, progress):
+    """任务: 批量搜索多个查询"""
+    return await get_multi_agent_system().batch_search(
+        payload['queries'], refresh=payload.get('refresh', 'full'), progress=progress)
+
+def get_job_queue():
+    """获取（必要时创建）任务队列，用于提交和查询任务；后台worker由 start_job_workers 启动"""
+    global job_queue
+    if job_queue is None:
+        with _job_queue_lock:
+            if job_queue is None:
+                queue = JobQueue()
+                queue.register('project_details', _run_project_details_job)
+                queue.register('generate_report', _run_generate_report_job)
+                queue.register('batch_search', _run_batch_search_job)
+                job_queue = queue
+    return job_queue
+
+def start_job_workers():
+    """在常驻的服务进程中启动任务队列的后台worker（启动时会恢复上次未完成的任务）
+    
+    每个进程只调用一次：开发服务器在启动时调用，gunicorn 在 post_fork 钩子中调用（见 gunicorn.conf.py）。
+    不能在请求中启动，否则worker线程可能属于一个随时退出的进程，领取的任务永远无法完成。
+    """
+    get_job_queue().start()
+
+def _accepted(job):
+    """任务已受理的响应"""
+    return jsonify({
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/jobs/{job['job_id']}",
+        'events_url': f"/jobs/{job['job_id']}/events"
+    }), 202
+
+
+def _json_with_etag(data):
+    """带ETag的JSON响应；客户端缓存的内容未变化时返回304，省去传输和重新渲染"""
+    etag = hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(data)
+    response.set_etag(etag)
+    return response
+
+# 按请求开启的性能剖析：设置 PROFILING_TOKEN 后，请求头 X-Profile 与其一致的请求会被采样，
+# 响应头 X-Profile-Output 返回火焰图路径；X-Profile-Block-Ms 可同时为该请求开启事件循环阻塞检测
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+
+@app.before_request
+def _start_request_profiling():
+    if not PROFILING_TOKEN or request.headers.get('X-Profile') != PROFILING_TOKEN:
+        return
+    # 先校验参数再启动采样线程，无效的请求头不会留下未停止的采样线程
+    block_ms = request.headers.get('X-Profile-Block-Ms', '100')
+    try:
+        threshold = float(block_ms) if block_ms else None
+        if threshold is not None and not (math.isfinite(threshold) and threshold >= 0):
+            raise ValueError(block_ms)
+    except ValueError:
+        return jsonify({'error': 'Invalid X-Profile-Block-Ms'}), 400
+    g.loop_block_threshold = threshold / 1000 if threshold is not None else None
+    g.profiler = StackSampler(threading.get_ident())
+    g.profiler.start()
+
+@app.after_request
+def _finish_request_profiling(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        counts = profiler.stop()
+        name = request.path.strip('/').replace('/', '_') or 'index'
+        folded_path, svg_path = write_flamegraph(counts, name)
+        print(f"Profile written: {svg_path}")
+        response.headers['X-Profile-Output'] = svg_path
+    return response
+
+@app.teardown_request
+def _stop_request_profiling(exc):
+    # 视图抛出未处理的异常时after_request不会执行，在这里停止采样线程
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+def _run_async(coro):
+    """在当前请求线程中运行协程；开启剖析的请求附带事件循环阻塞检测"""
+    return run_coroutine(coro, block_threshold=g.get('loop_block_threshold'))
 
 @app.route('/')
 def index():
@@ -26,6 +161,8 @@ def search_projects():
     """使用多智能体系统搜索项目"""
     data = request.json
     query = data.get('query')
+    # refresh='delta' 时只重新处理有变化的仓库
+    refresh = data.get('refresh', 'full')
     
     if not query:
         print("No query provided")
@@ -34,10 +171,7 @@ def search_projects():
     print(f"Received query: {query}")
     
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(multi_agent_system.process_query(query))
-        loop.close()
+        result = _run_async(get_multi_agent_system().process_query(query, refresh=refresh))
         
         # 测试代码：从本地文件读取项目数据，减少API消耗
         ########################
@@ -83,6 +217,31 @@ def search_projects():
         return jsonify({'error': f'Multi-agent processing failed: {str(e)}'}), 500
 
 
+@app.route('/batch_search', methods=['POST'])
+def batch_search():
+    """批量搜索多个查询，候选仓库跨查询去重、只获取一次详情
+    
+    耗时较长，默认作为后台任务执行（返回任务ID）；"async": false 时同步返回结果。
+    """
+    data = request.json
+    queries = [q for q in (data.get('queries') or []) if isinstance(q, str) and q.strip()]
+    refresh = data.get('refresh', 'full')
+    
+    if not queries:
+        return jsonify({'error': 'Queries parameter is missing'}), 400
+    
+    print(f"Received batch search: {len(queries)} queries")
+    
+    if data.get('async', True):
+        job = get_job_queue().submit('batch_search', {'queries': queries, 'refresh': refresh})
+        return _accepted(job)
+    
+    try:
+        return jsonify(_run_async(get_multi_agent_system().batch_search(queries, refresh=refresh)))
+    except Exception as e:
+        print(f"Batch search error: {e}")
+        return jsonify({'error': f'Batch search failed: {str(e)}'}), 500
+
 @app.route('/project_details', methods=['POST'])
 def project_details():
     """处理选中的项目 - 优先读取本地保存的结果，如果没有再调用智能体"""
@@ -97,16 +256,14 @@ def project_details():
 
     # 如果提供了repo_name，先尝试从本地文件读取
     if repo_name:
-        repo_name_clean = repo_name.replace('/', '_', 1)
-        file_path = f'./auto_search/{query}/{repo_name_clean}.json'
+        file_path = store.project_path(query, repo_name)
         print(f"Attempting to read cached project details from: {file_path}")
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
-        except FileNotFoundError:
-            print(f"Cached file not found: {file_path}")
-            return jsonify({'error': 'Project not found in cache'}), 404
+            cached_data = store.read_json(file_path)
+            if cached_data is None:
+                print(f"Cached file not found: {file_path}")
+                return jsonify({'error': 'Project not found in cache'}), 404
         except json.JSONDecodeError:
              print(f"Invalid JSON in cached file: {file_path}")
              return jsonify({'error': 'Invalid cached data'}), 500
@@ -114,15 +271,20 @@ def project_details():
          # 检查是否有完整的分析结果
         if (cached_data.get('analysis_result') and cached_data.get('report_result') and cached_data.get('category_result')):
             print(f"Found cached analysis for project: {repo_name}")
-            return jsonify(cached_data)
+            return _json_with_etag(cached_data)
         else:
             print(f"Cached data incomplete for project: {repo_name}, will analyze with AI")
+            
+            if data.get('async'):
+                job = get_job_queue().submit(
+                    'project_details', {'query': query, 'repo_name': repo_name},
+                    work_key=f"project_details:{file_path}")
+                return _accepted(job)
              
             try:
                 # 调用多智能体系统进行分析
-                import asyncio
-                result = asyncio.run(multi_agent_system.process_selected_project(query, cached_data))
-                return jsonify(result)
+                result = _run_async(get_multi_agent_system().process_selected_project(query, cached_data))
+                return _json_with_etag(result)
             except Exception as e:
                 print(f"Multi-agent analysis error: {e}")
                 return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
@@ -145,10 +307,14 @@ def generate_report():
     
     print(f"Generating report for query: {query}, projects: {selected_projects}")
     
+    if data.get('async'):
+        job = get_job_queue().submit(
+            'generate_report', {'query': query, 'selected_projects': selected_projects})
+        return _accepted(job)
+    
     try:
         # 调用多智能体系统生成报告
-        import asyncio
-        result = asyncio.run(multi_agent_system.generate_summary_report(query, selected_projects))
+        result = _run_async(get_multi_agent_system().generate_summary_report(query, selected_projects))
         
         return jsonify({
             'success': True,
@@ -164,6 +330,73 @@ def generate_report():
             'error': f'Report generation failed: {str(e)}'
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """查询后台任务状态和结果"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job['events'] = get_job_queue().events(job_id)
+    return jsonify(job)
+
+# 单个SSE响应最长保持的秒数；到时关闭连接，浏览器的EventSource会带上Last-Event-ID自动重连续传，
+# 避免一个进度流在整个任务期间一直占用服务器的一个工作线程
+SSE_MAX_SECONDS = float(os.getenv('SSE_MAX_SECONDS', '30'))
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """以Server-Sent Events流式推送任务进度，任务结束后发送最终状态并关闭
+
+    每个响应最多保持 SSE_MAX_SECONDS 秒，之后客户端以 Last-Event-ID 重连继续读取。
+    """
+    queue = get_job_queue()
+    if queue.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    try:
+        start_seq = int(request.headers.get('Last-Event-ID', 0) or 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    
+    def generate():
+        last_seq = start_seq
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        # 连接关闭后1秒重连
+        yield "retry: 1000\n\n"
+        while True:
+            for event in queue.events(job_id, last_seq):
+                last_seq = event['seq']
+                yield f"id: {last_seq}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            job = queue.get(job_id)
+            if job['status'] in TERMINAL_STATUSES:
+                yield f"event: done\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+                return
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(1)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """运行统计（模型健康状况、结构化输出解析失败率）"""
+    return jsonify(get_multi_agent_system().get_stats())
+
+@app.route('/corpus_stats', methods=['POST'])
+def corpus_stats():
+    """查询（或其中选中项目）的预计算统计：分位数、语言占比、评分排行、分类分布"""
+    data = request.json
+    query = data.get('query')
+    if not query:
+        return jsonify({'error': 'Query parameter is missing'}), 400
+    
+    try:
+        return jsonify(_run_async(get_multi_agent_system().corpus_stats(query, data.get('selected_projects'))))
+    except Exception as e:
+        print(f"Corpus stats error: {e}")
+        return jsonify({'error': f'Corpus stats failed: {str(e)}'}), 500
+
 @app.route('/download_report/<path:filename>')
 def download_report(filename):
     """下载报告文件"""
@@ -199,4 +432,9 @@ if __name__ == "__main__":
     if not os.path.exists('auto_search'):
         os.makedirs('auto_search')
     
+    # 开发服务器只用于单进程调试；多worker部署请使用预fork的服务器（见 README 的"多worker部署"）:
+    #   gunicorn -c gunicorn.conf.py main:app
+    # debug模式下reloader的父进程只负责监视文件，worker只在实际提供服务的子进程中启动
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_workers()
     app.run(debug=True, port=5001)  # 使用不同的端口避免冲突
\ No newline at end of file
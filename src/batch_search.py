@@ -0,0 +1,62 @@
+"""批量搜索命令行入口
+
+用法:
+    python -m src.batch_search queries.txt                 # 每行一个查询
+    cat queries.txt | python -m src.batch_search - --refresh delta -o results.json
+"""
+import sys
+import json
+import argparse
+from typing import List
+
+from src.profiling import run_coroutine
+
+
+def _read_queries(paths: List[str]) -> List[str]:
+    """读取查询列表，忽略空行和 # 开头的注释行"""
+    queries = []
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            queries.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith('#'))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    return queries
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='批量搜索GitHub项目（候选仓库跨查询去重，每个仓库只获取一次详情）')
+    parser.add_argument('files', nargs='*', default=['-'], help="查询文件，每行一个查询；'-' 表示标准输入")
+    parser.add_argument('--refresh', choices=['full', 'delta'], default='full',
+                        help='delta: 只重新处理有变化的仓库')
+    parser.add_argument('-o', '--output', help='结果写入的JSON文件，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    queries = _read_queries(args.files)
+    if not queries:
+        print('没有读取到查询', file=sys.stderr)
+        return 1
+
+    from src.multi_agent_system import MultiAgentSystem
+    system = MultiAgentSystem()
+
+    def progress(message: str):
+        print(message, file=sys.stderr)
+
+    result = run_coroutine(system.batch_search(queries, refresh=args.refresh, progress=progress))
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    print(f"统计: {json.dumps(result['stats'], ensure_ascii=False)}", file=sys.stderr)
+    for query, error in result['failed_queries'].items():
+        print(f"搜索失败: {query}: {error}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILENAME = '.corpus.npz'
+PERCENTILES = (25, 50, 75, 90)
+
+_STRING_COLUMNS = ('repo_name', 'primary_category', 'maintenance_status', 'complexity_level')
+_NUMBER_COLUMNS = ('stars', 'forks', 'watchers', 'size', 'activity_score', 'code_quality_score')
+_DATE_COLUMNS = ('created_at', 'pushed_at')
+
+
+def parse_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_github_time(value) -> np.datetime64:
+    """GitHub的ISO时间（2023-01-01T00:00:00Z）转为秒精度的datetime64，无法解析时为NaT"""
+    try:
+        return np.datetime64(str(value).rstrip('Z')[:19], 's') if value else np.datetime64('NaT', 's')
+    except ValueError:
+        return np.datetime64('NaT', 's')
+
+
+def _distribution(values: np.ndarray) -> Optional[Dict[str, float]]:
+    """数值列的分布：最小/分位数/最大/均值，忽略缺失值"""
+    valid = values[~np.isnan(values)]
+    if valid.size == 0:
+        return None
+    percentiles = np.percentile(valid, PERCENTILES)
+    return {
+        'min': round(float(valid.min()), 2),
+        **{f'p{q}': round(float(v), 2) for q, v in zip(PERCENTILES, percentiles)},
+        'max': round(float(valid.max()), 2),
+        'mean': round(float(valid.mean()), 2)
+    }
+
+
+def _histogram(values: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """类别列的计数和占比，按数量降序，忽略空值"""
+    values = values[values != '']
+    if values.size == 0:
+        return {}
+    names, counts = np.unique(values, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    return {str(names[i]): {'count': int(counts[i]), 'share': round(float(counts[i] / values.size), 3)}
+            for i in order}
+
+
+class CorpusSnapshot:
+    """项目记录的列式快照
+
+    每个字段是一列NumPy数组（每行一个项目），各语言的代码字节数存为 项目×语言 矩阵。
+    快照以压缩的 .npz 保存在查询目录下，读取时不必逐个解析JSON记录，
+    分位数、语言占比、评分排行、分类直方图等统计都在数组上向量化计算。
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], languages: np.ndarray,
+                 language_bytes: np.ndarray, signature: str = ''):
+        self.columns = columns
+        self.languages = languages
+        self.language_bytes = language_bytes
+        self.signature = signature
+
+    def __len__(self) -> int:
+        return len(self.columns['repo_name'])
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], signature: str = '') -> 'CorpusSnapshot':
+        analyses = [record.get('analysis_result') or {} for record in records]
+        categories = [record.get('category_result') or {} for record in records]
+        sources = {
+            'repo_name': records, 'primary_category': categories,
+            'maintenance_status': analyses, 'complexity_level': analyses,
+            'stars': records, 'forks': records, 'watchers': records, 'size': records,
+            'activity_score': analyses, 'code_quality_score': analyses,
+            'created_at': records, 'pushed_at': records
+        }
+
+        columns: Dict[str, np.ndarray] = {}
+        for name in _STRING_COLUMNS:
+            columns[name] = np.array([str(item.get(name) or '') for item in sources[name]], dtype=str)
+        for name in _NUMBER_COLUMNS:
+            columns[name] = np.array([parse_number(item.get(name)) for item in sources[name]], dtype=np.float64)
+        for name in _DATE_COLUMNS:
+            columns[name] = np.array([parse_github_time(item.get(name)) for item in sources[name]], dtype='datetime64[s]')
+
+        languages = sorted({lang for record in records for lang in (record.get('languages') or {})})
+        lang_index = {lang: i for i, lang in enumerate(languages)}
+        language_bytes = np.zeros((len(records), len(languages)), dtype=np.float64)
+        for row, record in enumerate(records):
+            for lang, size in (record.get('languages') or {}).items():
+                language_bytes[row, lang_index[lang]] = np.nan_to_num(parse_number(size))
+
+        return cls(columns, np.array(languages, dtype=str), language_bytes, signature)
+
+    def save(self, path: str):
+        """原子写入压缩快照"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, languages=self.languages, language_bytes=self.language_bytes,
+                                    signature=np.array(self.signature), **self.columns)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'CorpusSnapshot':
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in _STRING_COLUMNS + _NUMBER_COLUMNS + _DATE_COLUMNS}
+            return cls(columns, data['languages'], data['language_bytes'], str(data['signature']))
+
+    def subset(self, repo_names: Iterable[str]) -> 'CorpusSnapshot':
+        """按仓库名筛选出部分项目"""
+        mask = np.isin(self.columns['repo_name'], np.array(list(repo_names), dtype=str))
+        return CorpusSnapshot({name: column[mask] for name, column in self.columns.items()},
+                              self.languages, self.language_bytes[mask], self.signature)
+
+    def aggregates(self, top_n: int = 5, top_languages: int = 10) -> Dict[str, Any]:
+        """计算汇总统计，结果只含基本类型，可直接序列化后放入提示词"""
+        count = len(self)
+        stats: Dict[str, Any] = {'project_count': count}
+        if count == 0:
+            return stats
+
+        for name in ('stars', 'forks', 'watchers'):
+            stats[name] = _distribution(self.columns[name])
+
+        # 语言：按代码字节数加权的占比，以及各语言作为主语言的项目数
+        totals = self.language_bytes.sum(axis=0)
+        if totals.sum() > 0:
+            share = totals / totals.sum()
+            order = np.argsort(-share, kind='stable')[:top_languages]
+            stats['language_share'] = {str(self.languages[i]): round(float(share[i]), 3)
+                                       for i in order if share[i] > 0}
+            has_languages = self.language_bytes.sum(axis=1) > 0
+            primary = self.languages[np.argmax(self.language_bytes[has_languages], axis=1)]
+            stats['primary_language'] = {name: item['count'] for name, item in _histogram(primary).items()}
+
+        # 评分：分布与综合评分（活跃度+代码质量）排行，同分按star数排序
+        activity = self.columns['activity_score']
+        quality = self.columns['code_quality_score']
+        combined = activity + quality
+        stats['activity_score'] = _distribution(activity)
+        stats['code_quality_score'] = _distribution(quality)
+        scored = np.flatnonzero(~np.isnan(combined))
+        if top_n and scored.size:
+            stars = np.nan_to_num(self.columns['stars'][scored])
+            ranked = scored[np.lexsort((-stars, -combined[scored]))][:top_n]
+            stats['score_ranking'] = [{
+                'repo_name': str(self.columns['repo_name'][i]),
+                'combined_score': round(float(combined[i]), 2),
+                'activity_score': round(float(activity[i]), 2),
+                'code_quality_score': round(float(quality[i]), 2),
+                'stars': int(np.nan_to_num(self.columns['stars'][i]))
+            } for i in ranked]
+
+        stats['primary_category'] = _histogram(self.columns['primary_category'])
+        stats['maintenance_status'] = _histogram(self.columns['maintenance_status'])
+        stats['complexity_level'] = _histogram(self.columns['complexity_level'])
+
+        # 项目年龄与距最近一次推送的天数
+        now = np.datetime64('now', 's')
+        day = np.timedelta64(1, 'D')
+        stats['age_years'] = _distribution((now - self.columns['created_at']) / day / 365.25)
+        stats['days_since_push'] = _distribution((now - self.columns['pushed_at']) / day)
+        return stats
+
+
+class CorpusStore:
+    """按查询维护列式快照：查询目录下的项目记录有新增、删除或修改时才重建"""
+
+    def __init__(self, store: Optional[SharedStore] = None):
+        self.store = store or SharedStore()
+
+    def snapshot_path(self, query: str) -> str:
+        # 以点开头，不会被当作项目记录读取
+        return os.path.join(self.store.query_dir(query), SNAPSHOT_FILENAME)
+
+    def _record_files(self, query: str) -> Tuple[List[str], str]:
+        """项目记录文件列表及其签名（文件名+修改时间）"""
+        directory = self.store.query_dir(query)
+        try:
+            names = sorted(name for name in os.listdir(directory)
+                           if name.endswith('.json') and not name.startswith('.'))
+        except FileNotFoundError:
+            return [], ''
+        digest = hashlib.sha1()
+        paths = []
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                digest.update(f"{name}:{os.stat(path).st_mtime_ns};".encode('utf-8'))
+            except FileNotFoundError:
+                continue
+            paths.append(path)
+        return paths, digest.hexdigest()
+
+    def load(self, query: str) -> CorpusSnapshot:
+        """读取查询的快照，记录有变化时重建并保存"""
+        paths, signature = self._record_files(query)
+        snapshot_path = self.snapshot_path(query)
+        try:
+            snapshot = CorpusSnapshot.load(snapshot_path)
+            if snapshot.signature == signature:
+                return snapshot
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取语料快照失败，重新构建 {snapshot_path}: {e}")
+
+        records = []
+        for path in paths:
+            try:
+                record = self.store.read_json(path)
+            except Exception as e:
+                logger.warning(f"跳过无法解析的项目记录 {path}: {e}")
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+
+        snapshot = CorpusSnapshot.from_records(records, signature)
+        if paths:
+            try:
+                snapshot.save(snapshot_path)
+            except Exception as e:
+                logger.warning(f"保存语料快照失败 {snapshot_path}: {e}")
+        return snapshot
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import queue
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+
+from src.profiling import run_coroutine
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any], Callable[[str], None]], Awaitable[Dict[str, Any]]]
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    work_key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_work_key ON jobs (work_key);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, seq);
+"""
+
+
+class JobQueue:
+    """持久化任务队列
+
+    长耗时的项目分析和汇总报告以任务形式提交，立即返回任务ID；
+    固定数量的后台worker线程从SQLite队列中领取任务执行，进度以事件形式写入数据库，
+    客户端可轮询状态或流式读取进度。任务以租约方式领取，进程重启或崩溃后，
+    未完成的任务会在租约过期（或原进程确认已退出）后被重新执行。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None,
+                 lease_seconds: float = 600, max_attempts: int = 3, poll_interval: float = 0.5):
+        self.db_path = db_path or os.getenv('JOB_DB_PATH', './jobs/jobs.db')
+        self.workers = workers or int(os.getenv('JOB_WORKERS', '2'))
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # 任务协程中上报的进度由单独的写入线程落库，避免SQLite写入阻塞事件循环
+        self._progress_queue: "queue.Queue[tuple]" = queue.Queue()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程一个连接；fork出的子进程不能复用父进程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def register(self, kind: str, handler: JobHandler):
+        """注册任务类型的处理函数: async handler(payload, progress) -> result"""
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, payload: Dict[str, Any], work_key: Optional[str] = None) -> Dict[str, Any]:
+        """提交任务；相同work_key的任务还在排队或执行时直接返回已有任务"""
+        if kind not in self._handlers:
+            raise ValueError(f"未知的任务类型: {kind}")
+
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if work_key:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE work_key = ? AND status IN ('queued', 'running') "
+                    "ORDER BY created_at DESC LIMIT 1", (work_key,)).fetchone()
+                if row is not None:
+                    conn.execute("COMMIT")
+                    return self._to_dict(row)
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, work_key, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, work_key, json.dumps(payload, ensure_ascii=False), now, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._add_event(job_id, "任务已提交")
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """读取任务进度事件（seq大于after_seq的部分）"""
+        rows = self._conn().execute(
+            "SELECT seq, ts, message FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after_seq)).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'job_id': row['id'],
+            'type': row['kind'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'attempts': row['attempts'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+    def _add_event(self, job_id: str, message: str):
+        self._conn().execute(
+            "INSERT INTO job_events (job_id, ts, message) VALUES (?, ?, ?)",
+            (job_id, time.time(), message))
+
+    def start(self):
+        """启动后台worker线程（重复调用无副作用）"""
+        if self._threads:
+            return
+        self._recover_orphans()
+        writer = threading.Thread(target=self._progress_writer_loop, name="job-progress-writer", daemon=True)
+        writer.start()
+        self._threads.append(writer)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"任务队列已启动: {self.workers} 个worker, 数据库 {self.db_path}")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _recover_orphans(self):
+        """本机上已退出进程遗留的执行中任务立即重新排队，不必等待租约过期"""
+        hostname = socket.gethostname()
+        rows = self._conn().execute(
+            "SELECT id, owner FROM jobs WHERE status = 'running' AND owner LIKE ?",
+            (f"{hostname}:%",)).fetchall()
+        for row in rows:
+            pid = int(row['owner'].rsplit(':', 1)[1])
+            if pid != os.getpid() and not _pid_alive(pid):
+                self._conn().execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE id = ? AND status = 'running'", (time.time(), row['id']))
+                self._add_event(row['id'], "进程重启，任务重新排队")
+                logger.info(f"恢复未完成任务: {row['id']}")
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """领取一个排队中或租约已过期的任务"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1", (now,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (self.owner, now + self.lease_seconds, now, row['id']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+        """写入最终状态；成功结果即使租约已被其他worker接管也会保留"""
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status != 'succeeded' AND (owner = ? OR ? = 'succeeded')",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+             error, time.time(), job_id, self.owner, status))
+
+    def _progress_writer_loop(self):
+        """写入任务进度事件，每次上报进度同时续租，避免长任务被其他worker抢走"""
+        while True:
+            job_id, message = self._progress_queue.get()
+            try:
+                now = time.time()
+                self._add_event(job_id, message)
+                self._conn().execute(
+                    "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                    (now + self.lease_seconds, now, job_id, self.owner))
+            except Exception as e:
+                logger.error(f"写入任务进度失败 {job_id}: {e}")
+            finally:
+                self._progress_queue.task_done()
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except Exception as e:
+                logger.error(f"领取任务失败: {e}")
+                row = None
+
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._run(row)
+
+    def _run(self, row: sqlite3.Row):
+        job_id = row['id']
+        handler = self._handlers.get(row['kind'])
+        if handler is None:
+            self._finish(job_id, 'failed', error=f"未知的任务类型: {row['kind']}")
+            return
+
+        if row['attempts'] > self.max_attempts:
+            self._add_event(job_id, "超过最大重试次数")
+            self._finish(job_id, 'failed', error="超过最大重试次数")
+            return
+
+        def progress(message: str):
+            # 在协程中调用：只入队，不在事件循环线程上执行SQLite写入
+            self._progress_queue.put((job_id, message))
+
+        progress(f"开始执行（第{row['attempts']}次）")
+        try:
+            result = run_coroutine(handler(json.loads(row['payload']), progress))
+            # 先等已上报的进度落库，保证最终状态之前的事件都能被读到
+            self._progress_queue.join()
+            self._add_event(job_id, "任务完成")
+            self._finish(job_id, 'succeeded', result=result)
+        except Exception as e:
+            logger.error(f"任务执行失败 {job_id}: {e}")
+            self._progress_queue.join()
+            self._add_event(job_id, f"任务失败: {e}")
+            self._finish(job_id, 'failed', error=str(e))
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # Windows 上 os.kill 会直接结束进程，只能依赖租约过期
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
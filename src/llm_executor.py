@@ -0,0 +1,254 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 这些异常（按类名匹配，避免直接依赖openai包）可以重试
+_RETRYABLE_ERROR_NAMES = {
+    'RateLimitError', 'APITimeoutError', 'APIConnectionError',
+    'InternalServerError', 'ServiceUnavailableError', 'TimeoutError'
+}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, asyncio.TimeoutError) or is_rate_limited(error):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500
+    return type(error).__name__ in _RETRYABLE_ERROR_NAMES
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """读取服务端返回的Retry-After（秒）"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """AIMD自适应并发上限
+
+    成功时上限缓慢增加（每个"窗口"约+1），遇到429时减半。
+    使用线程锁而不是asyncio原语，因为Flask请求和后台任务各自运行独立的事件循环；
+    名额不足时每个等待者在自己的事件循环上挂一个future，名额空出时按到达顺序
+    通过 call_soon_threadsafe 唤醒，而不是轮询。
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_cooldown: float = 1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_cooldown = decrease_cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            # 已有等待者时不插队
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        future = waiter[1]
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    granted = True
+            # 名额已分配：future已被设置结果时由这里归还，否则由 _grant 归还
+            if granted and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def _wake_waiters(self):
+        """持有锁时调用：把空出的名额按到达顺序交给等待者"""
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._grant, future)
+            except RuntimeError:
+                # 等待者所在的事件循环已关闭
+                continue
+            self.in_flight += 1
+
+    def _grant(self, future: asyncio.Future):
+        # 在等待者自己的事件循环中执行；等待已被取消时归还名额
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def on_success(self):
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._wake_waiters()
+
+    def on_rate_limited(self):
+        with self._lock:
+            now = time.monotonic()
+            # 同一批并发请求同时收到429时只减一次
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+                logger.warning(f"LLM限流，并发上限降至 {int(self.limit)}")
+
+
+class LLMExecutor:
+    """共享的LLM调用执行层
+
+    包装对同一个模型（ChatOpenAI实例）的所有调用：
+    - 自适应并发上限，收到429时退避
+    - 可重试错误（429/超时/5xx/连接错误）按指数退避+随机抖动重试
+    - 每次尝试有超时时间，整个调用（含排队、重试、退避和对冲）另有总时限
+    - 可选的对冲请求：调用超过 hedge_after 秒仍未返回时，在并发余量允许时再发一次，取先返回者
+    """
+
+    def __init__(self, llm=None, max_concurrency: Optional[int] = None, max_retries: Optional[int] = None,
+                 timeout: Optional[float] = None, hedge_after: Optional[float] = None,
+                 total_timeout: Optional[float] = None, base_delay: float = 1.0, max_delay: float = 20.0):
+        self.llm = llm
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', '3'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('LLM_TIMEOUT', '60'))
+        self.total_timeout = (total_timeout if total_timeout is not None
+                              else float(os.getenv('LLM_TOTAL_TIMEOUT', '120')))
+        if hedge_after is None and os.getenv('LLM_HEDGE_AFTER'):
+            hedge_after = float(os.getenv('LLM_HEDGE_AFTER'))
+        self.hedge_after = hedge_after
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = AdaptiveLimiter(
+            max_concurrency if max_concurrency is not None else int(os.getenv('LLM_MAX_CONCURRENCY', '8')))
+        self.stats = {'calls': 0, 'retries': 0, 'rate_limited': 0, 'timeouts': 0, 'hedged': 0, 'failures': 0,
+                      'deadline_exceeded': 0}
+
+    def deadline(self) -> float:
+        """从现在起算的总时限（time.monotonic() 时刻）"""
+        return time.monotonic() + self.total_timeout
+
+    async def run(self, make_call: Callable[[], Awaitable[T]], timeout: Optional[float] = None,
+                  hedge_after: Optional[float] = None, deadline: Optional[float] = None,
+                  on_attempt: Optional[Callable[[float], None]] = None) -> T:
+        """执行一次LLM调用；make_call每次被调用都应返回一个新的协程
+
+        deadline 为 time.monotonic() 时刻，缺省为 self.deadline()。每次尝试的超时不超过剩余时间，
+        剩余时间不够退避等待时不再重试。
+        on_attempt(耗时) 在每次实际发给模型的请求结束后调用，不含排队和退避等待；
+        因总时限所剩不多而被提前截断的超时尝试不上报，免得把本地排队的时间算到模型头上。
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        hedge_after = hedge_after if hedge_after is not None else self.hedge_after
+        deadline = deadline if deadline is not None else self.deadline()
+        self.stats['calls'] += 1
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.wait_for(self.limiter.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.stats['deadline_exceeded'] += 1
+                self.stats['failures'] += 1
+                raise
+            attempt_timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+            started = time.monotonic()
+            try:
+                result = await self._call_with_hedge(make_call, attempt_timeout, hedge_after)
+                if on_attempt:
+                    on_attempt(time.monotonic() - started)
+                self.limiter.on_success()
+                return result
+            except Exception as e:
+                if on_attempt and not (isinstance(e, asyncio.TimeoutError) and attempt_timeout < timeout):
+                    on_attempt(time.monotonic() - started)
+                if is_rate_limited(e):
+                    self.stats['rate_limited'] += 1
+                    self.limiter.on_rate_limited()
+                elif isinstance(e, asyncio.TimeoutError):
+                    self.stats['timeouts'] += 1
+
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self.stats['failures'] += 1
+                    raise
+
+                delay = _retry_after(e)
+                if delay is None:
+                    # full jitter: 在 [0, base*2^attempt] 内随机，避免多个worker同时重试
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                if time.monotonic() + delay >= deadline:
+                    self.stats['deadline_exceeded'] += 1
+                    self.stats['failures'] += 1
+                    raise
+                self.stats['retries'] += 1
+                logger.warning(f"LLM调用失败({type(e).__name__})，{delay:.1f}秒后第{attempt + 1}次重试")
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(delay)
+
+    async def _call_with_hedge(self, make_call: Callable[[], Awaitable[T]], timeout: float,
+                               hedge_after: Optional[float]) -> T:
+        primary = asyncio.ensure_future(asyncio.wait_for(make_call(), timeout))
+        if not hedge_after or hedge_after >= timeout:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        # 对冲请求也占用并发名额，没有余量时不发
+        if done or not self.limiter.try_acquire():
+            return await primary
+
+        self.stats['hedged'] += 1
+        hedge = asyncio.ensure_future(asyncio.wait_for(make_call(), timeout))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # 两个请求都失败，抛出原始请求的异常
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            self.limiter.release()
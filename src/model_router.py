@@ -0,0 +1,183 @@
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from src.llm_executor import LLMExecutor
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 各角色默认使用的模型档位: fast 适合是/否过滤、查询改写和只判断技术栈/复杂度的项目分析
+# （评分由本地计算），strong 适合长篇报告
+ROLE_TIERS = {
+    'query_understanding': 'fast',
+    'filtering': 'fast',
+    'analysis': 'fast',
+    'categorization': 'default',
+    'reporting': 'strong',
+    'summary': 'strong'
+}
+
+# 各角色的延迟阈值（秒），长篇汇总报告本身就慢，阈值更宽
+DEFAULT_LATENCY_THRESHOLDS = {
+    'query_understanding': 10.0,
+    'filtering': 10.0,
+    'analysis': 30.0,
+    'categorization': 30.0,
+    'reporting': 45.0,
+    'summary': 180.0
+}
+
+# 各角色每次尝试的超时和总时限（秒，总时限含排队、重试、退避和切换备用模型）。
+# 单次超时要高于延迟阈值：长篇汇总报告慢但正常时不能被取消后降级为备用报告
+DEFAULT_TIMEOUTS = {
+    'query_understanding': (30.0, 60.0),
+    'filtering': (30.0, 60.0),
+    'analysis': (60.0, 120.0),
+    'categorization': (60.0, 120.0),
+    'reporting': (90.0, 180.0),
+    'summary': (300.0, 420.0)
+}
+
+
+@dataclass
+class ModelHealth:
+    """某个角色在某个模型上的健康状况（EWMA延迟与错误率，熔断状态）"""
+    latency_threshold: float
+    error_rate_threshold: float
+    min_samples: int = 5
+    cooldown: float = 60.0
+    alpha: float = 0.2
+    ewma_latency: float = 0.0
+    ewma_error: float = 0.0
+    samples: int = 0
+    tripped_until: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.tripped_until
+
+    def record(self, latency: float, ok: bool) -> bool:
+        """记录一次调用，越过阈值时熔断并返回True"""
+        with self._lock:
+            if self.samples == 0:
+                self.ewma_latency = latency
+                self.ewma_error = 0.0 if ok else 1.0
+            else:
+                self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+                self.ewma_error += self.alpha * ((0.0 if ok else 1.0) - self.ewma_error)
+            self.samples += 1
+
+            if self.samples >= self.min_samples and (
+                    self.ewma_latency > self.latency_threshold or self.ewma_error > self.error_rate_threshold):
+                # 冷却期内切到备用模型；冷却结束后重新积累样本再判断（半开）
+                self.tripped_until = time.monotonic() + self.cooldown
+                self.samples = 0
+                return True
+            return False
+
+
+class ModelRouter:
+    """按智能体角色路由到不同模型，并在模型变慢或出错时自动切换到备用模型
+
+    模型配置来自环境变量：
+    - MODEL / MODEL_FAST / MODEL_STRONG: 三个档位的模型，未设置时回退到 MODEL
+    - MODEL_<ROLE>: 覆盖某个角色的主模型，如 MODEL_FILTERING=deepseek-chat
+    - MODEL_<ROLE>_FALLBACK / MODEL_FALLBACK: 备用模型
+    - MODEL_<ROLE>_LATENCY_THRESHOLD / MODEL_ERROR_RATE_THRESHOLD: 切换阈值
+    - MODEL_<ROLE>_TIMEOUT / MODEL_<ROLE>_TOTAL_TIMEOUT: 每次尝试的超时和整个调用的总时限
+    每个模型有独立的 ChatOpenAI 实例和 LLMExecutor（独立的并发上限）。
+    """
+
+    def __init__(self, build_llm: Callable[[str], Any]):
+        self.build_llm = build_llm
+        self.default_model = os.getenv("MODEL", "deepseek-chat")
+        tiers = {
+            'default': self.default_model,
+            'fast': os.getenv("MODEL_FAST") or self.default_model,
+            'strong': os.getenv("MODEL_STRONG") or self.default_model
+        }
+        error_rate_threshold = float(os.getenv("MODEL_ERROR_RATE_THRESHOLD", "0.5"))
+
+        self.routes: Dict[str, List[str]] = {}
+        self.health: Dict[tuple, ModelHealth] = {}
+        self.timeouts: Dict[str, tuple] = {}
+        for role, tier in ROLE_TIERS.items():
+            env_role = role.upper()
+            primary = os.getenv(f"MODEL_{env_role}") or tiers[tier]
+            fallback = os.getenv(f"MODEL_{env_role}_FALLBACK") or os.getenv("MODEL_FALLBACK")
+            self.routes[role] = [primary] + ([fallback] if fallback and fallback != primary else [])
+
+            latency_threshold = float(os.getenv(f"MODEL_{env_role}_LATENCY_THRESHOLD",
+                                                DEFAULT_LATENCY_THRESHOLDS[role]))
+            for model in self.routes[role]:
+                self.health[(role, model)] = ModelHealth(latency_threshold, error_rate_threshold)
+
+            timeout, total_timeout = DEFAULT_TIMEOUTS[role]
+            self.timeouts[role] = (float(os.getenv(f"MODEL_{env_role}_TIMEOUT", timeout)),
+                                   float(os.getenv(f"MODEL_{env_role}_TOTAL_TIMEOUT", total_timeout)))
+
+        self._llms: Dict[str, Any] = {}
+        self._executors: Dict[str, LLMExecutor] = {}
+        self._lock = threading.Lock()
+
+    def _model_entry(self, model: str):
+        """按模型名获取（必要时创建）ChatOpenAI实例及其执行层"""
+        with self._lock:
+            if model not in self._llms:
+                self._llms[model] = self.build_llm(model)
+                self._executors[model] = LLMExecutor(self._llms[model])
+            return self._llms[model], self._executors[model]
+
+    def _candidates(self, role: str) -> List[str]:
+        """按优先级排列的候选模型，熔断中的模型排到最后"""
+        models = self.routes.get(role) or [self.default_model]
+        healthy = [m for m in models if self.health.get((role, m)) is None or self.health[(role, m)].healthy()]
+        return healthy + [m for m in models if m not in healthy]
+
+    async def run(self, role: str, make_call: Callable[[Any], Awaitable[T]],
+                  deadline: Optional[float] = None) -> T:
+        """以角色对应的模型执行调用；make_call(llm) 每次返回新的协程。主模型失败时尝试备用模型
+
+        每次尝试的超时和总时限按角色配置。主模型和备用模型共用一个总时限
+        （deadline，time.monotonic() 时刻），备用模型只能使用剩余的时间。
+        """
+        timeout, total_timeout = self.timeouts.get(role, (None, None))
+        candidates = self._candidates(role)
+        for i, model in enumerate(candidates):
+            llm, executor = self._model_entry(model)
+            if deadline is None:
+                deadline = time.monotonic() + total_timeout if total_timeout else executor.deadline()
+            health = self.health.get((role, model))
+            # 健康状况按实际发给模型的最后一次请求的耗时记录，不含本地排队、退避和Retry-After等待
+            attempts: List[float] = []
+            try:
+                result = await executor.run(lambda: make_call(llm), timeout=timeout, deadline=deadline,
+                                            on_attempt=attempts.append)
+            except Exception as e:
+                # 请求还在本地排队时就到了总时限（从未发给模型），不算模型出错
+                if health and attempts and health.record(attempts[-1], ok=False):
+                    logger.warning(f"模型 {model} 在 {role} 上错误率过高，暂时切换到备用模型")
+                if i == len(candidates) - 1 or time.monotonic() >= deadline:
+                    raise
+                logger.warning(f"模型 {model} 调用失败({type(e).__name__})，改用 {candidates[i + 1]}")
+                continue
+            if health and health.record(attempts[-1], ok=True):
+                logger.warning(f"模型 {model} 在 {role} 上延迟过高，暂时切换到备用模型")
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """各角色路由与健康状况，便于排查"""
+        return {
+            role: [{
+                'model': model,
+                'healthy': self.health[(role, model)].healthy(),
+                'ewma_latency': round(self.health[(role, model)].ewma_latency, 3),
+                'ewma_error_rate': round(self.health[(role, model)].ewma_error, 3)
+            } for model in models]
+            for role, models in self.routes.items()
+        }
@@ -1,34 +1,22 @@
 import os
 import json
+import time
 import asyncio
+import hashlib
 import logging
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 from pydantic import BaseModel, Field
-import requests
-from urllib.parse import urlparse
-import re
-
-# LangChain imports
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain.tools import Tool
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.output_parsers import PydanticOutputParser
-
-# 尝试导入 GoogleSearchAPIWrapper，如果失败则使用备用方案
-try:
-    from langchain_community.tools import GoogleSearchAPIWrapper
-except ImportError:
-    try:
-        from langchain_community.utilities import GoogleSearchAPIWrapper
-    except ImportError:
-        print("Warning: GoogleSearchAPIWrapper not available, using fallback implementation")
-        GoogleSearchAPIWrapper = None
-from langchain.tools import tool
 from dotenv import load_dotenv
+from src.prompt_registry import PromptRegistry
+from src.shared_state import SharedStore
+from src.model_router import ModelRouter
+from src.structured_output import StructuredOutputChain
+
+# 注意：langchain / langchain_openai / requests / numpy 体积较大，统一在首次使用时再导入，
+# 以缩短进程冷启动时间（见 MultiAgentSystem._init_llm 与 StructuredOutputChain）
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -37,20 +25,6 @@ logger = logging.getLogger(__name__)
 # 加载环境变量
 load_dotenv()
 
-# 加载提示词配置
-def load_prompts():
-    """从prompts.json文件加载提示词配置"""
-    try:
-        prompts_path = os.path.join(os.path.dirname(__file__), 'prompts.json')
-        with open(prompts_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"加载提示词配置失败: {e}")
-        return {}
-
-# 全局提示词配置
-PROMPTS = load_prompts()
-
 @dataclass
 class ProjectData:
     """项目数据结构"""
@@ -76,6 +50,16 @@ class SearchResult(BaseModel):
     projects: List[Dict[str, Any]] = Field(description="搜索到的项目列表")
     total_count: int = Field(description="总项目数量")
     search_query: str = Field(description="搜索查询")
+    error: Optional[str] = Field(default=None, description="GitHub搜索失败时的错误信息（区别于没有匹配结果）")
+
+class BatchSearchResult(BaseModel):
+    """批量搜索结果模型"""
+    results: Dict[str, SearchResult] = Field(description="每个查询的搜索结果")
+    candidate_count: int = Field(description="所有查询的候选仓库总数（未去重）")
+    unique_repo_count: int = Field(description="去重后的候选仓库数")
+    enriched_count: int = Field(description="实际获取详情的仓库数")
+    filter_count: int = Field(description="大模型过滤调用次数")
+    failed_queries: Dict[str, str] = Field(default_factory=dict, description="GitHub搜索失败的查询及错误信息")
 
 class AnalysisResult(BaseModel):
     """分析结果模型"""
@@ -86,6 +70,11 @@ class AnalysisResult(BaseModel):
     complexity_level: str = Field(description="复杂度等级: 简单/中等/复杂")
     maintenance_status: str = Field(description="维护状态: 活跃/一般/停滞")
 
+class QualitativeAnalysis(BaseModel):
+    """定性分析结果模型（评分和维护状态由本地评分计算，大模型只负责这两项）"""
+    tech_stack: List[str] = Field(description="技术栈")
+    complexity_level: str = Field(description="复杂度等级: 简单/中等/复杂")
+
 class CategoryResult(BaseModel):
     """分类结果模型"""
     repo_name: str = Field(description="仓库名称")
@@ -104,88 +93,106 @@ class MultiAgentSystem:
     """多智能体系统主类"""
     
     def __init__(self):
-        self.llm = self._init_llm()
-        self.search_agent = SearchAgent(self.llm)
-        self.analysis_agent = AnalysisAgent(self.llm)
-        self.categorization_agent = CategorizationAgent(self.llm)
-        self.reporting_agent = ReportingAgent(self.llm)
+        # 按智能体角色路由模型：过滤/查询改写用快模型，报告用强模型，变慢或出错时切换备用模型
+        # 每个模型有独立的执行层，统一做并发控制、重试和超时
+        self.router = ModelRouter(self._init_llm)
+        self.prompt_registry = PromptRegistry()
+        self.store = SharedStore()
+        self.search_agent = SearchAgent(self.router, self.prompt_registry, self.store)
+        self.analysis_agent = AnalysisAgent(self.router, self.prompt_registry)
+        self.categorization_agent = CategorizationAgent(self.router, self.prompt_registry)
+        self.reporting_agent = ReportingAgent(self.router, self.prompt_registry)
         
-    def _init_llm(self):
+    def _init_llm(self, model: Optional[str] = None):
         """初始化语言模型"""
+        from langchain_openai import ChatOpenAI
+
         api_key = os.getenv("API_KEY")
         base_url = os.getenv("BASE_URL")
-        model = os.getenv("MODEL", "deepseek-chat")
+        model = model or os.getenv("MODEL", "deepseek-chat")
         
         return ChatOpenAI(
             api_key=api_key,
             base_url=base_url,
             model=model,
-            temperature=0.1
+            temperature=0.1,
+            max_retries=0  # 重试由LLMExecutor统一处理
         )
     
+    def get_stats(self) -> Dict[str, Any]:
+        """运行统计：模型路由健康状况和结构化输出解析失败率"""
+        structured_outputs = {
+            'analysis': self.analysis_agent.structured_output,
+            'categorization': self.categorization_agent.structured_output,
+            'reporting': self.reporting_agent.structured_output
+        }
+        return {
+            'models': self.router.stats(),
+            'structured_output': {
+                role: {**chain.stats, 'mode': chain.mode, 'parse_failure_rate': round(chain.parse_failure_rate, 4),
+                       'by_model': chain.stats_by_model()}
+                for role, chain in structured_outputs.items()
+            }
+        }
+    
     async def _update_project_file_with_all_results(self, query: str, project_data: Dict[str, Any], 
                                                    analysis_result: AnalysisResult, 
                                                    category_result: CategoryResult,
-                                                   report_result: ReportResult):
-        """更新项目文件，添加分析、分类和报告结果"""
-        try:
-            import json
-            import os
-            
-            # 构建文件路径（与保存时相同的逻辑）
-            safe_query = query.replace('/', '_').replace('\\', '_').replace(':', '_')
-            safe_repo_name = project_data['repo_name'].replace('/', '_')
+                                                   report_result: ReportResult) -> Optional[Dict[str, Any]]:
+        """更新项目文件，添加分析、分类和报告结果；返回写入后的记录，文件不存在或写入失败时返回None"""
+        file_path = self.store.project_path(query, project_data['repo_name'])
+        
+        from src.scoring import SCORING_VERSION
+        
+        def add_results(existing_data: Dict[str, Any]):
+            # 添加分析结果
+            existing_data['analysis_result'] = {
+                'activity_score': analysis_result.activity_score,
+                'code_quality_score': analysis_result.code_quality_score,
+                'tech_stack': analysis_result.tech_stack,
+                'complexity_level': analysis_result.complexity_level,
+                'maintenance_status': analysis_result.maintenance_status
+            }
+            existing_data['scoring_version'] = SCORING_VERSION
             
-            file_path = f"./auto_search/{safe_query}/{safe_repo_name}.json"
+            # 添加分类结果
+            existing_data['category_result'] = {
+                'primary_category': category_result.primary_category,
+                'secondary_categories': category_result.secondary_categories,
+                'tags': category_result.tags
+            }
             
-            # 检查文件是否存在
-            if os.path.exists(file_path):
-                # 读取现有数据
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-                
-                # 添加分析结果
-                existing_data['analysis_result'] = {
-                    'activity_score': analysis_result.activity_score,
-                    'code_quality_score': analysis_result.code_quality_score,
-                    'tech_stack': analysis_result.tech_stack,
-                    'complexity_level': analysis_result.complexity_level,
-                    'maintenance_status': analysis_result.maintenance_status
-                }
-                
-                # 添加分类结果
-                existing_data['category_result'] = {
-                    'primary_category': category_result.primary_category,
-                    'secondary_categories': category_result.secondary_categories,
-                    'tags': category_result.tags
-                }
-                
-                # 添加报告结果
-                existing_data['report_result'] = {
-                    'repo_name': report_result.repo_name,
-                    'rating': report_result.rating,
-                    'summary': report_result.summary,
-                    'recommendation_reason': report_result.recommendation_reason
-                }
-                
-                # 保存更新后的数据
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(existing_data, f, ensure_ascii=False, indent=2)
-                
-                logger.info(f"已更新项目文件（所有结果）: {file_path}")
-            else:
+            # 添加报告结果
+            existing_data['report_result'] = {
+                'repo_name': report_result.repo_name,
+                'rating': report_result.rating,
+                'summary': report_result.summary,
+                'recommendation_reason': report_result.recommendation_reason
+            }
+        
+        try:
+            # 在记录锁内读取-修改-写回，避免多个worker互相覆盖
+            updated = await asyncio.to_thread(self.store.update_json, file_path, add_results)
+            if updated is None:
                 logger.warning(f"项目文件不存在: {file_path}")
+            else:
+                logger.info(f"已更新项目文件（所有结果）: {file_path}")
+            return updated
                 
         except Exception as e:
             logger.error(f"更新项目文件（所有结果）失败 {project_data.get('repo_name', '')}: {e}")
+            return None
     
-    async def process_query(self, query: str) -> Dict[str, Any]:
-        """处理查询的主要流程 - 只执行搜索步骤"""
+    async def process_query(self, query: str, refresh: str = 'full') -> Dict[str, Any]:
+        """处理查询的主要流程 - 只执行搜索步骤
+        
+        refresh='delta' 用于重复执行已知查询（如每日定时重扫），只重新处理有变化的仓库。
+        """
         print(f"开始处理查询: {query}")
         
         # 步骤1: 搜索项目
         print("步骤1: 搜索GitHub项目...")
-        search_results = await self.search_agent.search_projects(query)
+        search_results = await self.search_agent.search_projects(query, refresh=refresh)
         
         # 返回搜索结果，不进行后续的分析、分类和报告
         return {
@@ -195,24 +202,85 @@ class MultiAgentSystem:
             'timestamp': datetime.now().isoformat()
         }
     
-    async def process_selected_project(self, query: str, project_data: Dict[str, Any]) -> Dict[str, Any]:
-        """处理选中的项目 - 执行分析、分类和报告"""
+    async def batch_search(self, queries: List[str], refresh: str = 'full',
+                           progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """批量搜索多个查询（如一次扫描50~200个相关查询），候选仓库跨查询去重，
+        每个仓库只获取一次详情，耗时随去重后的仓库数增长，而不是查询数×仓库数
+        """
+        started = datetime.now()
+        print(f"开始批量搜索: {len(queries)} 个查询")
+        
+        batch = await self.search_agent.batch_search(queries, refresh=refresh, progress=progress)
+        
+        return {
+            'results': {
+                query: {
+                    'projects': result.projects,
+                    'total_count': result.total_count,
+                    'search_query': result.search_query,
+                    'error': result.error
+                }
+                for query, result in batch.results.items()
+            },
+            'failed_queries': batch.failed_queries,
+            'stats': {
+                'query_count': len(batch.results),
+                'failed_query_count': len(batch.failed_queries),
+                'candidate_count': batch.candidate_count,
+                'unique_repo_count': batch.unique_repo_count,
+                'enriched_count': batch.enriched_count,
+                'filter_count': batch.filter_count,
+                'elapsed_seconds': round((datetime.now() - started).total_seconds(), 2)
+            },
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    async def process_selected_project(self, query: str, project_data: Dict[str, Any],
+                                       progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """处理选中的项目 - 执行分析、分类和报告
+        
+        以 (查询, 仓库) 作为work key：多个worker同时请求同一项目时只有一个真正调用智能体，
+        其余worker等待锁释放后直接读取写入共享存储的结果。
+        已保存的结果只有在内容指纹与传入数据一致时才会复用，仓库有变化则重新分析。
+        """
+        file_path = self.store.project_path(query, project_data.get('repo_name', ''))
+        fingerprint = project_data.get('content_fingerprint')
+        
+        def load_completed():
+            data = self.store.read_json(file_path)
+            if not (data and data.get('analysis_result') and data.get('category_result') and data.get('report_result')):
+                return None
+            if fingerprint and data.get('content_fingerprint') != fingerprint:
+                return None
+            return data
+        
+        return await self.store.run_once(
+            f"analyze:{file_path}", load_completed,
+            lambda: self._analyze_selected_project(query, project_data, progress))
+    
+    async def _analyze_selected_project(self, query: str, project_data: Dict[str, Any],
+                                        progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """依次调用分析、分类、报告智能体并保存结果"""
+        report_progress = progress or print
         print(f"开始处理选中的项目: {project_data.get('repo_name', '')}")
         
         # 步骤2: 分析项目
-        print("步骤2: 分析项目详情...")
+        report_progress("步骤2: 分析项目详情...")
         analysis = await self.analysis_agent.analyze_project(project_data)
         
         # 步骤3: 分类整理
-        print("步骤3: 分类整理项目...")
+        report_progress("步骤3: 分类整理项目...")
         category = await self.categorization_agent.categorize_project(project_data, analysis)
         
         # 步骤4: 生成报告
-        print("步骤4: 生成最终报告...")
+        report_progress("步骤4: 生成最终报告...")
         report = await self.reporting_agent.generate_report(project_data, analysis, category)
         
-        # 将所有结果（分析、分类、报告）保存到对应的文件中
-        await self._update_project_file_with_all_results(query, project_data, analysis, category, report)
+        # 将所有结果（分析、分类、报告）保存到对应的文件中；返回保存后的记录，
+        # 与之后直接读取记录的请求内容一致（ETag也一致）
+        saved = await self._update_project_file_with_all_results(query, project_data, analysis, category, report)
+        if saved is not None:
+            return saved
         
         return {
             **project_data,
@@ -221,31 +289,38 @@ class MultiAgentSystem:
             'report_result': report.dict() if report else None
         }
     
-    async def generate_summary_report(self, query: str, selected_projects: List[str]) -> Dict[str, Any]:
+    async def generate_summary_report(self, query: str, selected_projects: List[str],
+                                      progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """生成选中项目的汇总报告"""
+        report_progress = progress or print
         print(f"开始生成汇总报告: {query}, 选中项目: {selected_projects}")
         
         try:
             # 读取选中项目的数据
             projects_data = []
             for project_name in selected_projects:
-                safe_query = query.replace('/', '_').replace('\\', '_').replace(':', '_')
-                safe_repo_name = project_name.replace('/', '_')
-                file_path = f"./auto_search/{safe_query}/{safe_repo_name}.json"
+                file_path = self.store.project_path(query, project_name)
+                project_data = await asyncio.to_thread(self.store.read_json, file_path)
                 
-                if os.path.exists(file_path):
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        project_data = json.load(f)
-                        projects_data.append(project_data)
-                        print(f"已读取项目数据: {project_data}")
+                if project_data is not None:
+                    projects_data.append(project_data)
+                    print(f"已读取项目数据: {project_data}")
                 else:
                     logger.warning(f"项目文件不存在: {file_path}")
             
             if not projects_data:
                 raise Exception("没有找到有效的项目数据")
             
+            # 预计算统计（分位数、语言占比、评分排行、分类分布），提示词中不再附带完整记录
+            try:
+                corpus_stats = await self.corpus_stats(query, [p.get('repo_name', '') for p in projects_data])
+            except Exception as e:
+                logger.warning(f"计算汇总统计失败，报告将不含预计算统计: {e}")
+                corpus_stats = None
+            
             # 使用报告智能体生成汇总报告
-            summary_report = await self.reporting_agent.generate_summary_report(query, projects_data)
+            report_progress(f"已读取 {len(projects_data)} 个项目，正在生成汇总报告...")
+            summary_report = await self.reporting_agent.generate_summary_report(query, projects_data, corpus_stats)
             
             # 保存报告到文件
             report_path = await self._save_summary_report(query, summary_report)
@@ -260,6 +335,25 @@ class MultiAgentSystem:
             logger.error(f"生成汇总报告失败: {e}")
             raise e
     
+    async def corpus_stats(self, query: str, selected_projects: Optional[List[str]] = None) -> Dict[str, Any]:
+        """基于查询的列式快照计算统计：指定项目时统计选中项目，并附上整个查询的对照数据"""
+        return await asyncio.to_thread(self._compute_corpus_stats, query, selected_projects)
+    
+    def _compute_corpus_stats(self, query: str, selected_projects: Optional[List[str]] = None) -> Dict[str, Any]:
+        # numpy 在首次使用时才导入
+        from src.corpus_stats import CorpusStore
+        snapshot = CorpusStore(self.store).load(query)
+        if not selected_projects:
+            return {'query_corpus': snapshot.aggregates()}
+        
+        stats = {'selected': snapshot.subset(selected_projects).aggregates()}
+        if len(snapshot) > stats['selected']['project_count']:
+            # 整个查询只保留用于对照的几项，控制提示词长度
+            corpus = snapshot.aggregates(top_n=0)
+            stats['query_corpus'] = {key: corpus[key] for key in
+                                     ('project_count', 'stars', 'language_share', 'primary_category') if key in corpus}
+        return stats
+    
     async def _save_summary_report(self, query: str, summary_report: str) -> str:
         """保存汇总报告到文件"""
         try:
@@ -290,21 +384,39 @@ class MultiAgentSystem:
 class SearchAgent:
     """GitHub搜索专家智能体 - 智能理解查询并搜索"""
     
-    def __init__(self, llm=None):
-        self.llm = llm
+    def __init__(self, router: Optional[ModelRouter] = None, prompt_registry: Optional[PromptRegistry] = None,
+                 store: Optional[SharedStore] = None):
+        self.router = router
+        self.prompt_registry = prompt_registry or PromptRegistry()
+        self.store = store or SharedStore()
         self.github_token = os.getenv('GITHUB_TOKEN')
         self.headers = {}
         if self.github_token:
             self.headers['Authorization'] = f'token {self.github_token}'
-        
-        # 加载prompts配置
-        self.prompts = load_prompts().get('search_agent', {})
+        # GitHub搜索接口单独限流（登录后约每分钟30次，未登录10次），与详情接口的并发限制无关；
+        # 按固定间隔发放请求时间，多个事件循环（Flask请求、后台任务）共享同一个节奏
+        default_rate = '30' if self.github_token else '10'
+        self.search_interval = 60.0 / float(os.getenv('GITHUB_SEARCH_PER_MINUTE') or default_rate)
+        self.search_retries = int(os.getenv('GITHUB_SEARCH_RETRIES', '3'))
+        self._next_search_at = 0.0
+        self._search_lock = threading.Lock()
     
-    async def search_projects(self, query: str) -> SearchResult:
-        """使用大模型理解查询意图，然后进行GitHub API搜索"""
+    async def search_projects(self, query: str, refresh: str = 'full') -> SearchResult:
+        """使用大模型理解查询意图，然后进行GitHub API搜索
+        
+        refresh='delta' 时复用上次搜索的结果：搜索结果中 pushed_at 与内容指纹未变化的仓库
+        不再请求GitHub详情接口，也不再调用大模型过滤，只刷新star等计数；
+        变化的仓库重新获取详情并写入新记录（旧的分析结果随之失效）。
+        """
         try:
-            # 使用大模型理解查询意图并构建GitHub搜索查询
-            github_query = await self._understand_query_with_llm(query)
+            delta = refresh == 'delta'
+            index = await asyncio.to_thread(self._load_delta_index, query)
+            known_repos = index.get('repos', {})
+            
+            # 使用大模型理解查询意图并构建GitHub搜索查询（增量模式下复用上次的结果）
+            github_query = index.get('github_query') if delta else None
+            if not github_query:
+                github_query = await self._understand_query_with_llm(query)
             logger.info(f"原始查询: {query}")
             logger.info(f"转换后的GitHub查询: {github_query}")
             
@@ -313,11 +425,30 @@ class SearchAgent:
             
             # 获取详细信息并根据原始查询要求进行过滤
             projects = []
+            reused_count = 0
             for repo in repos[:20]:  # 获取更多结果用于过滤
+                repo_name = repo.get('full_name', '')
+                fingerprint = self._content_fingerprint(repo)
+                known = known_repos.get(repo_name)
+                
+                if delta and known and known.get('fingerprint') == fingerprint:
+                    if not known.get('accepted'):
+                        # 上次已被过滤掉且内容未变化
+                        continue
+                    project_data = await self._refresh_stored_project(query, repo)
+                    if project_data is not None:
+                        projects.append(project_data)
+                        reused_count += 1
+                        if len(projects) >= 10:
+                            break
+                        continue
+                
                 project_data = await self._get_project_details(repo)
                 if project_data:
                     # 使用大模型判断项目是否符合原始查询要求
-                    if await self._filter_project_with_llm(query, project_data):
+                    accepted = await self._filter_project_with_llm(query, project_data)
+                    known_repos[repo_name] = {'fingerprint': fingerprint, 'accepted': accepted}
+                    if accepted:
                         projects.append(project_data)
                         # 保存项目数据到文件
                         await self._save_project_data(query, project_data)
@@ -326,6 +457,12 @@ class SearchAgent:
                         if len(projects) >= 10:
                             break
             
+            if delta:
+                logger.info(f"增量刷新: 复用 {reused_count} 个未变化的项目，重新处理 {len(projects) - reused_count} 个")
+            await asyncio.to_thread(self._save_delta_index, query,
+                                    {'github_query': github_query, 'repos': known_repos})
+            self._attach_quick_scores(projects)
+            
             return SearchResult(
                 projects=projects,
                 total_count=len(projects),
@@ -335,25 +472,198 @@ class SearchAgent:
             logger.error(f"搜索出错: {e}")
             return SearchResult(projects=[], total_count=0, search_query=query)
     
+    async def batch_search(self, queries: List[str], refresh: str = 'full',
+                           progress: Optional[Callable[[str], None]] = None) -> BatchSearchResult:
+        """批量搜索：多个查询共享仓库详情
+        
+        1. 并发改写所有查询并搜索GitHub；
+        2. 合并所有查询的候选仓库并去重，每个仓库只获取一次详情（语言/文件/README）；
+        3. 在共享的详情数据上按 (查询, 仓库) 并发执行大模型过滤，每个查询按搜索排名保留前10个。
+        以吞吐量优先：每个查询的候选都会全部过滤，不像单个查询那样凑够10个就停止。
+        同时获取详情的仓库数由 GITHUB_MAX_CONCURRENCY 控制；同时发起的大模型调用（查询改写、过滤）
+        不超过 LLM_MAX_CONCURRENCY，在此之内再由LLMExecutor自适应控制。
+        """
+        report_progress = progress or logger.info
+        queries = list(dict.fromkeys(q for q in queries if q))  # 去重并保持顺序
+        delta = refresh == 'delta'
+        github_limit = asyncio.Semaphore(int(os.getenv('GITHUB_MAX_CONCURRENCY', '8')))
+        llm_limit = asyncio.Semaphore(int(os.getenv('LLM_MAX_CONCURRENCY', '8')))
+        
+        async def limited(make_call, *args, limit: asyncio.Semaphore = github_limit):
+            async with limit:
+                return await make_call(*args)
+        
+        # 步骤1: 读取增量索引，改写查询并搜索GitHub
+        indexes = dict(zip(queries, await asyncio.gather(
+            *(asyncio.to_thread(self._load_delta_index, query) for query in queries))))
+        
+        failed_queries: Dict[str, str] = {}
+        
+        async def search_one(query: str):
+            github_query = indexes[query].get('github_query') if delta else None
+            if not github_query:
+                github_query = await limited(self._understand_query_with_llm, query, limit=llm_limit)
+            # 搜索接口由 _search_repositories 按速率限制排队，不占用详情请求的并发名额
+            try:
+                repos = await self._search_repositories(github_query)
+            except Exception as e:
+                logger.error(f"搜索出错 {query}: {e}")
+                failed_queries[query] = str(e)
+                repos = []
+            return github_query, repos[:20]
+        
+        searched = dict(zip(queries, await asyncio.gather(*(search_one(query) for query in queries))))
+        report_progress(f"已完成 {len(queries)} 个查询的GitHub搜索"
+                        + (f"，其中 {len(failed_queries)} 个失败" if failed_queries else ""))
+        
+        # 步骤2: 增量模式下内容未变化的仓库直接沿用上次的过滤结论
+        decisions: Dict[tuple, Optional[Dict[str, Any]]] = {}  # (查询, 仓库) -> 项目数据，None表示被过滤
+        reuse = []
+        for query, (_, repos) in searched.items():
+            known_repos = indexes[query].get('repos', {})
+            for repo in repos:
+                known = known_repos.get(repo.get('full_name', ''))
+                if delta and known and known.get('fingerprint') == self._content_fingerprint(repo):
+                    if known.get('accepted'):
+                        reuse.append((query, repo))
+                    else:
+                        decisions[(query, repo.get('full_name', ''))] = None
+        refreshed = await asyncio.gather(*(self._refresh_stored_project(query, repo) for query, repo in reuse))
+        for (query, repo), project_data in zip(reuse, refreshed):
+            if project_data is not None:
+                decisions[(query, repo.get('full_name', ''))] = project_data
+        
+        # 步骤3: 其余候选合并去重，每个仓库只获取一次详情
+        to_enrich: Dict[str, Dict[str, Any]] = {}
+        for query, (_, repos) in searched.items():
+            for repo in repos:
+                if (query, repo.get('full_name', '')) not in decisions:
+                    to_enrich.setdefault(repo.get('full_name', ''), repo)
+        candidate_count = sum(len(repos) for _, repos in searched.values())
+        unique_repo_count = len({repo.get('full_name', '') for _, repos in searched.values() for repo in repos})
+        report_progress(f"候选仓库 {candidate_count} 个，去重后 {unique_repo_count} 个，需获取详情 {len(to_enrich)} 个")
+        details = dict(zip(to_enrich.keys(), await asyncio.gather(
+            *(limited(self._get_project_details, repo) for repo in to_enrich.values()))))
+        
+        # 步骤4: 在共享的详情数据上按 (查询, 仓库) 并发过滤
+        pairs = [(query, repo) for query, (_, repos) in searched.items() for repo in repos
+                 if (query, repo.get('full_name', '')) not in decisions and details.get(repo.get('full_name', ''))]
+        verdicts = await asyncio.gather(
+            *(limited(self._filter_project_with_llm, query, details[repo['full_name']], limit=llm_limit)
+              for query, repo in pairs))
+        report_progress(f"已完成 {len(pairs)} 次项目过滤")
+        
+        filtered = set()
+        for (query, repo), accepted in zip(pairs, verdicts):
+            repo_name = repo['full_name']
+            indexes[query].setdefault('repos', {})[repo_name] = {
+                'fingerprint': self._content_fingerprint(repo), 'accepted': accepted}
+            # 每个查询保存自己的副本，后续分析结果按查询分别写入
+            decisions[(query, repo_name)] = dict(details[repo_name]) if accepted else None
+            filtered.add((query, repo_name))
+        
+        # 步骤5: 每个查询按搜索排名保留前10个项目，保存新通过的项目和增量索引
+        results: Dict[str, SearchResult] = {}
+        saves = []
+        for query, (_, repos) in searched.items():
+            projects = []
+            for repo in repos:
+                key = (query, repo.get('full_name', ''))
+                if decisions.get(key) is None:
+                    continue
+                projects.append(decisions[key])
+                if key in filtered:
+                    saves.append(self._save_project_data(query, decisions[key]))
+                if len(projects) >= 10:
+                    break
+            results[query] = SearchResult(projects=projects, total_count=len(projects), search_query=query,
+                                          error=failed_queries.get(query))
+        await asyncio.gather(*saves)
+        await asyncio.gather(*(asyncio.to_thread(
+            self._save_delta_index, query,
+            {'github_query': searched[query][0], 'repos': indexes[query].get('repos', {})}) for query in queries))
+        self._attach_quick_scores([project for result in results.values() for project in result.projects])
+        
+        return BatchSearchResult(
+            results=results,
+            candidate_count=candidate_count,
+            unique_repo_count=unique_repo_count,
+            enriched_count=len(to_enrich),
+            filter_count=len(pairs),
+            failed_queries=failed_queries
+        )
+    
+    @staticmethod
+    def _attach_quick_scores(projects: List[Dict[str, Any]]):
+        """为搜索结果附上本地评分（quick_scores），整个结果集一次向量化计算，不调用大模型"""
+        from src.scoring import score_projects
+        for project, scores in zip(projects, score_projects(projects)):
+            project['quick_scores'] = scores
+    
+    @staticmethod
+    def _content_fingerprint(repo: Dict[str, Any]) -> str:
+        """仓库内容指纹：只包含会影响分析结论的字段，star/fork等计数变化不会使其失效"""
+        license_info = repo.get('license') or {}
+        content = {
+            'pushed_at': repo.get('pushed_at', ''),
+            'description': repo.get('description', ''),
+            'topics': sorted(repo.get('topics', [])),
+            'license': license_info.get('name', ''),
+            'size': repo.get('size', 0),
+            'default_branch': repo.get('default_branch', ''),
+            'archived': repo.get('archived', False)
+        }
+        return hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _delta_index_path(self, query: str) -> str:
+        # 以点开头，不会被当作项目记录读取
+        return os.path.join(self.store.query_dir(query), '.delta_index.json')
+    
+    def _load_delta_index(self, query: str) -> Dict[str, Any]:
+        """读取查询的增量索引: 改写后的GitHub查询和每个仓库上次的指纹/过滤结论"""
+        try:
+            return self.store.read_json(self._delta_index_path(query)) or {}
+        except Exception as e:
+            logger.error(f"读取增量索引失败 {query}: {e}")
+            return {}
+    
+    def _save_delta_index(self, query: str, index: Dict[str, Any]):
+        try:
+            self.store.update_json(self._delta_index_path(query), lambda _: index, create=True)
+        except Exception as e:
+            logger.error(f"保存增量索引失败 {query}: {e}")
+    
+    async def _refresh_stored_project(self, query: str, repo: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """内容未变化的仓库：只用搜索结果刷新计数字段，保留已有的分析结果"""
+        def refresh_counts(data: Dict[str, Any]):
+            data['stars'] = repo.get('stargazers_count', data.get('stars', 0))
+            data['forks'] = repo.get('forks_count', data.get('forks', 0))
+            data['watchers'] = repo.get('watchers_count', data.get('watchers', 0))
+            data['last_commit'] = repo.get('updated_at', data.get('last_commit', ''))
+        
+        file_path = self.store.project_path(query, repo.get('full_name', ''))
+        try:
+            return await asyncio.to_thread(self.store.update_json, file_path, refresh_counts)
+        except Exception as e:
+            logger.error(f"刷新项目记录失败 {repo.get('full_name', '')}: {e}")
+            return None
+    
     async def _understand_query_with_llm(self, query: str) -> str:
         """使用大模型理解用户查询意图并构建GitHub搜索查询"""
         try:
-            if not self.llm:
+            if not self.router:
                 # 如果没有LLM，直接返回原查询
                 return query
             
             # 从prompts配置中获取模板
-            template = self.prompts.get('query_understanding_template', '')
+            template = self.prompt_registry.get_template('search_agent', 'query_understanding_template')
             if not template:
                 logger.warning("未找到query_understanding_template，使用默认查询")
                 return query
             
             prompt = template.format(query=query)
             
-            response = await asyncio.to_thread(
-                self.llm.invoke,
-                prompt
-            )
+            response = await self.router.run('query_understanding', lambda llm: llm.ainvoke(prompt))
             
             github_query = response.content.strip()
             return github_query
@@ -365,7 +675,7 @@ class SearchAgent:
     async def _filter_project_with_llm(self, original_query: str, project_data: Dict[str, Any]) -> bool:
         """使用大模型判断项目是否符合原始查询要求"""
         try:
-            if not self.llm:
+            if not self.router:
                 # 如果没有LLM，默认通过
                 return True
             
@@ -383,7 +693,7 @@ class SearchAgent:
                 """
             
             # 从prompts配置中获取模板
-            template = self.prompts.get('project_filtering_template', '')
+            template = self.prompt_registry.get_template('search_agent', 'project_filtering_template')
             if not template:
                 logger.warning("未找到project_filtering_template，默认通过过滤")
                 return True
@@ -393,10 +703,7 @@ class SearchAgent:
                 project_summary=project_summary
             )
             
-            response = await asyncio.to_thread(
-                self.llm.invoke,
-                prompt
-            )
+            response = await self.router.run('filtering', lambda llm: llm.ainvoke(prompt))
             
             result = response.content.strip().lower()
             return result == "是" or result == "yes" or result == "true"
@@ -405,8 +712,45 @@ class SearchAgent:
             logger.error(f"LLM过滤项目失败: {e}")
             return True  # 失败时默认通过
     
+    def _http_get(self, url: str, **kwargs):
+        """发起GitHub API请求，requests在首次请求时才导入"""
+        import requests
+        return requests.get(url, headers=self.headers, timeout=10, **kwargs)
+    
+    async def _ahttp_get(self, url: str, **kwargs):
+        """在线程中发起GitHub请求，不阻塞事件循环，多个仓库的请求可以并发进行"""
+        return await asyncio.to_thread(self._http_get, url, **kwargs)
+    
+    def _reserve_search_slot(self) -> float:
+        """预约下一次搜索请求的时间，返回需要等待的秒数"""
+        with self._search_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_search_at)
+            self._next_search_at = slot + self.search_interval
+            return slot - now
+    
+    def _pause_searches(self, seconds: float):
+        """被限流后推迟所有后续搜索请求"""
+        with self._search_lock:
+            self._next_search_at = max(self._next_search_at, time.monotonic() + seconds)
+    
+    @staticmethod
+    def _rate_limit_wait(response) -> Optional[float]:
+        """403/429响应如果是限流，返回应等待的秒数（Retry-After 或 X-RateLimit-Reset），否则返回None"""
+        if response.status_code not in (403, 429):
+            return None
+        headers = response.headers
+        try:
+            if headers.get('Retry-After'):
+                return float(headers['Retry-After'])
+            if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+                return max(1.0, float(headers['X-RateLimit-Reset']) - time.time() + 1)
+        except ValueError:
+            pass
+        return 60.0 if response.status_code == 429 else None
+    
     async def _search_repositories(self, query: str) -> List[Dict[str, Any]]:
-        """搜索GitHub仓库"""
+        """搜索GitHub仓库；按搜索接口的速率限制排队，被限流时按服务端给出的时间等待后重试"""
         url = 'https://api.github.com/search/repositories'
         params = {
             'q': query,
@@ -415,11 +759,18 @@ class SearchAgent:
             'per_page': 30  # 增加搜索结果数量以便过滤
         }
         
-        response = requests.get(url, headers=self.headers, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        return data.get('items', [])
+        for attempt in range(self.search_retries + 1):
+            await asyncio.sleep(self._reserve_search_slot())
+            response = await self._ahttp_get(url, params=params)
+            wait = self._rate_limit_wait(response)
+            if wait is not None and attempt < self.search_retries:
+                logger.warning(f"GitHub搜索被限流，{wait:.0f}秒后重试: {query}")
+                self._pause_searches(min(wait, 300.0))
+                continue
+            response.raise_for_status()
+            
+            data = response.json()
+            return data.get('items', [])
     
     async def _get_project_details(self, repo: Dict[str, Any]) -> Dict[str, Any]:
         """获取项目详细信息"""
@@ -427,14 +778,12 @@ class SearchAgent:
             # 基本信息
             repo_name = repo.get('full_name', '')
             
-            # 获取语言信息
-            languages = await self._get_languages(repo_name)
-            
-            # 获取文件信息
-            files = await self._get_repository_files(repo_name)
-            
-            # 获取README内容
-            readme_content = await self._get_readme_content(repo_name)
+            # 并发获取语言信息、根目录文件列表和README内容
+            languages, files, readme_content = await asyncio.gather(
+                self._get_languages(repo_name),
+                self._get_repository_files(repo_name),
+                self._get_readme_content(repo_name)
+            )
             
             return {
                 'repo_name': repo_name,
@@ -449,6 +798,8 @@ class SearchAgent:
                 'topics': repo.get('topics', []),
                 'size': repo.get('size', 0),
                 'created_at': repo.get('created_at', ''),
+                'pushed_at': repo.get('pushed_at', ''),
+                'content_fingerprint': self._content_fingerprint(repo),
                 'has_requirements_txt': 'requirements.txt' in files,
                 'has_dockerfile': 'Dockerfile' in files,
                 'has_readme': any('readme' in f.lower() for f in files),
@@ -462,7 +813,7 @@ class SearchAgent:
         """获取仓库语言信息"""
         try:
             url = f'https://api.github.com/repos/{repo_name}/languages'
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = await self._ahttp_get(url)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -473,7 +824,7 @@ class SearchAgent:
         """获取仓库根目录文件列表"""
         try:
             url = f'https://api.github.com/repos/{repo_name}/contents'
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = await self._ahttp_get(url)
             response.raise_for_status()
             
             contents = response.json()
@@ -492,7 +843,7 @@ class SearchAgent:
             for readme_file in readme_files:
                 try:
                     url = f'https://api.github.com/repos/{repo_name}/contents/{readme_file}'
-                    response = requests.get(url, headers=self.headers, timeout=10)
+                    response = await self._ahttp_get(url)
                     
                     if response.status_code == 200:
                         content_data = response.json()
@@ -510,33 +861,29 @@ class SearchAgent:
             return ""
     
     async def _save_project_data(self, query: str, project_data: Dict[str, Any]):
-        """保存项目数据到文件"""
+        """保存项目数据到共享存储（原子写入）"""
         try:
-            import json
-            import os
-            
-            # 创建目录结构
-            safe_query = query.replace('/', '_').replace('\\', '_').replace(':', '_')
-            safe_repo_name = project_data['repo_name'].replace('/', '_')
-            
-            dir_path = f"./auto_search/{safe_query}"
-            os.makedirs(dir_path, exist_ok=True)
-            
-            # 保存文件
-            file_path = f"{dir_path}/{safe_repo_name}.json"
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=2)
+            file_path = self.store.project_path(query, project_data['repo_name'])
+            await asyncio.to_thread(self.store.update_json, file_path, lambda _: project_data, True)
             
             logger.info(f"项目数据已保存到: {file_path}")
         except Exception as e:
             logger.error(f"保存项目数据失败 {project_data.get('repo_name', '')}: {e}")
 
 class AnalysisAgent:
-    """项目分析员智能体 - 直接分析搜索结果"""
+    """项目分析员智能体 - 直接分析搜索结果
+    
+    活跃度、代码质量和维护状态由本地评分（src/scoring.py）直接计算，
+    大模型只判断技术栈和复杂度等级这两项定性内容。
+    """
     
-    def __init__(self, llm):
-        self.llm = llm
-        self.parser = PydanticOutputParser(pydantic_object=AnalysisResult)
+    def __init__(self, router: ModelRouter, prompt_registry: Optional[PromptRegistry] = None):
+        self.router = router
+        self.prompt_registry = prompt_registry or PromptRegistry()
+        self.structured_output = StructuredOutputChain(
+            QualitativeAnalysis, self.prompt_registry,
+            'analysis_agent', 'analysis_prompt_template',
+            "请分析GitHub项目: {repo_name}，判断其技术栈和复杂度等级。{format_instructions}")
     
     async def analyze_project(self, project_data: Dict[str, Any]) -> AnalysisResult:
         """直接分析项目数据"""
@@ -553,11 +900,9 @@ class AnalysisAgent:
                 maintenance_status="一般"
             )
         
-        analysis_template = PROMPTS.get('analysis_agent', {}).get('analysis_prompt_template', 
-            "请分析GitHub项目: {repo_name}，基于项目信息进行评分和分类。{format_instructions}")
-        
-        prompt = ChatPromptTemplate.from_template(analysis_template)
-        chain = prompt | self.llm | self.parser
+        # 评分在本地计算，即使大模型调用失败也能给出
+        from src.scoring import score_projects
+        scores = score_projects([project_data])[0]
         
         try:
             # 安全地获取languages字段
@@ -583,7 +928,7 @@ class AnalysisAgent:
             readme_content = project_data.get("readme_content", "")
             readme_summary = readme_content[:500] + "..." if len(readme_content) > 500 else readme_content
             
-            result = await chain.ainvoke({
+            inputs = {
                 "repo_name": project_data.get("repo_name", ""),
                 "url": project_data.get("url", ""),
                 "description": project_data.get("description", ""),
@@ -600,38 +945,42 @@ class AnalysisAgent:
                 "has_dockerfile": project_data.get("has_dockerfile", False),
                 "has_readme": project_data.get("has_readme", False),
                 "readme_content": readme_summary,
-                "format_instructions": self.parser.get_format_instructions()
-            })
-            return result
+                "activity_score": scores['activity_score'],
+                "code_quality_score": scores['code_quality_score'],
+                "maintenance_status": scores['maintenance_status']
+            }
+            result = await self.structured_output.run(self.router, 'analysis', inputs)
+            return AnalysisResult(
+                repo_name=project_data.get("repo_name", ""),
+                tech_stack=result.tech_stack,
+                complexity_level=result.complexity_level,
+                **scores
+            )
         except Exception as e:
             print(f"分析项目出错: {e}")
             return AnalysisResult(
                 repo_name=project_data.get("repo_name", ""),
-                activity_score=5.0,
-                code_quality_score=5.0,
                 tech_stack=tech_stack_list if 'tech_stack_list' in locals() else [],
                 complexity_level="中等",
-                maintenance_status="一般"
+                **scores
             )
 
 class CategorizationAgent:
     """分类整理员智能体"""
     
-    def __init__(self, llm):
-        self.llm = llm
-        self.parser = PydanticOutputParser(pydantic_object=CategoryResult)
+    def __init__(self, router: ModelRouter, prompt_registry: Optional[PromptRegistry] = None):
+        self.router = router
+        self.prompt_registry = prompt_registry or PromptRegistry()
+        self.structured_output = StructuredOutputChain(
+            CategoryResult, self.prompt_registry,
+            'categorization_agent', 'categorization_prompt_template',
+            "请对以下项目进行分类: {repo_name}")
     
     async def categorize_project(self, project_data: Dict[str, Any], 
                                analysis_result: AnalysisResult) -> CategoryResult:
         """对项目进行分类"""
-        categorization_template = PROMPTS.get('categorization_agent', {}).get('categorization_prompt_template', 
-            "请对以下项目进行分类: {repo_name}")
-        prompt = ChatPromptTemplate.from_template(categorization_template)
-        
-        chain = prompt | self.llm | self.parser
-        
         try:
-            result = await chain.ainvoke({
+            inputs = {
                 "repo_name": project_data.get("repo_name", ""),
                 "description": project_data.get("description", ""),
                 "stars": project_data.get("stars", 0),
@@ -643,9 +992,9 @@ class CategorizationAgent:
                 "topics": ", ".join(project_data.get("topics", [])),
                 "tech_stack": ", ".join(analysis_result.tech_stack),
                 "complexity_level": analysis_result.complexity_level,
-                "maintenance_status": analysis_result.maintenance_status,
-                "format_instructions": self.parser.get_format_instructions()
-            })
+                "maintenance_status": analysis_result.maintenance_status
+            }
+            result = await self.structured_output.run(self.router, 'categorization', inputs)
             return result
         except Exception as e:
             print(f"分类项目出错: {e}")
@@ -659,26 +1008,24 @@ class CategorizationAgent:
 class ReportingAgent:
     """汇总报告员智能体"""
     
-    def __init__(self, llm):
-        self.llm = llm
-        self.parser = PydanticOutputParser(pydantic_object=ReportResult)
+    def __init__(self, router: ModelRouter, prompt_registry: Optional[PromptRegistry] = None):
+        self.router = router
+        self.prompt_registry = prompt_registry or PromptRegistry()
+        self.structured_output = StructuredOutputChain(
+            ReportResult, self.prompt_registry,
+            'reporting_agent', 'report_prompt_template',
+            "请为以下项目生成结构化报告: {repo_name}")
     
     async def generate_report(self, project_data: Dict[str, Any],
                             analysis_result: AnalysisResult,
                             category_result: CategoryResult) -> ReportResult:
         """生成项目报告"""
-        report_template = PROMPTS.get('reporting_agent', {}).get('report_prompt_template', 
-            "请为以下项目生成结构化报告: {repo_name}")
-        prompt = ChatPromptTemplate.from_template(report_template)
-        
-        chain = prompt | self.llm | self.parser
-        
         # 计算综合评分
         overall_score = (analysis_result.activity_score + analysis_result.code_quality_score) / 2
         star_rating = "⭐️" * min(5, max(1, int(overall_score / 2)))
         
         try:
-            result = await chain.ainvoke({
+            inputs = {
                 "repo_name": project_data.get("repo_name", ""),
                 "url": project_data.get("url", ""),
                 "description": project_data.get("description", ""),
@@ -690,9 +1037,9 @@ class ReportingAgent:
                 "tech_stack": ", ".join(analysis_result.tech_stack),
                 "maintenance_status": analysis_result.maintenance_status,
                 "primary_category": category_result.primary_category,
-                "tags": ", ".join(category_result.tags),
-                "format_instructions": self.parser.get_format_instructions()
-            })
+                "tags": ", ".join(category_result.tags)
+            }
+            result = await self.structured_output.run(self.router, 'reporting', inputs)
             return result
         except Exception as e:
             print(f"生成报告出错: {e}")
@@ -703,36 +1050,45 @@ class ReportingAgent:
                 recommendation_reason=f"基于活跃度评分{analysis_result.activity_score}和代码质量评分{analysis_result.code_quality_score}的综合推荐"
             )
     
-    async def generate_summary_report(self, query: str, projects_data: List[Dict[str, Any]]) -> str:
-        """生成多个项目的汇总报告"""
-        summary_template = PROMPTS.get('reporting_agent', {}).get('summary_report_template', 
-            "请为以下搜索查询生成项目汇总报告: {query}")
-        prompt = ChatPromptTemplate.from_template(summary_template)
+    async def generate_summary_report(self, query: str, projects_data: List[Dict[str, Any]],
+                                      corpus_stats: Optional[Dict[str, Any]] = None) -> str:
+        """生成多个项目的汇总报告
         
-        chain = prompt | self.llm
+        数值对比（star分布、语言占比、评分排行、分类统计）由 corpus_stats 预先算好，
+        每个项目只附带定性信息，提示词更短，报告中的数字也不依赖模型自行计算。
+        """
+        def chain_for(llm):
+            return self.prompt_registry.get_chain(
+                'reporting_agent', 'summary_report_template',
+                "请为以下搜索查询生成项目汇总报告: {query}\n\n预计算统计:\n{corpus_stats}\n\n项目摘要:\n{projects_data}",
+                llm)
         
         try:
-            # 准备项目数据摘要
+            # 准备项目数据摘要（只含定性信息，数值统计见 corpus_stats）
             projects_summary = []
             for project in projects_data:
+                analysis_result = project.get('analysis_result') or {}
+                category_result = project.get('category_result') or {}
+                report_result = project.get('report_result') or {}
                 project_info = {
                     'repo_name': project.get('repo_name', ''),
-                    'description': project.get('description', ''),
+                    'description': (project.get('description') or '')[:200],
                     'stars': project.get('stars', 0),
-                    'forks': project.get('forks', 0),
-                    'languages': project.get('languages', {}),
-                    'topics': project.get('topics', []),
-                    'analysis_result': project.get('analysis_result', {}),
-                    'category_result': project.get('category_result', {}),
-                    'report_result': project.get('report_result', {})
+                    'primary_category': category_result.get('primary_category', ''),
+                    'tech_stack': analysis_result.get('tech_stack', []),
+                    'rating': report_result.get('rating', ''),
+                    'summary': report_result.get('summary', ''),
+                    'recommendation_reason': report_result.get('recommendation_reason', '')
                 }
                 projects_summary.append(project_info)
             
-            result = await chain.ainvoke({
+            inputs = {
                 "query": query,
                 "projects_count": len(projects_data),
-                "projects_data": json.dumps(projects_summary, ensure_ascii=False, indent=2)
-            })
+                "projects_data": json.dumps(projects_summary, ensure_ascii=False),
+                "corpus_stats": json.dumps(corpus_stats, ensure_ascii=False) if corpus_stats else "（无）"
+            }
+            result = await self.router.run('summary', lambda llm: chain_for(llm).ainvoke(inputs))
             
             return result.content if hasattr(result, 'content') else str(result)
             
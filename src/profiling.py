@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from html import escape
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', './profiles')
+
+
+class StackSampler:
+    """采样指定线程的调用栈，聚合为折叠栈（flamegraph.pl / speedscope 的输入格式）"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.counts[';'.join(reversed(stack))] += 1
+
+
+def _render_flamegraph_svg(counts: Counter, title: str, width: int = 1200, row_height: int = 16) -> str:
+    """把折叠栈渲染成一个简单的SVG火焰图"""
+    tree: Dict[str, Any] = {'count': 0, 'children': {}}
+    for stack, count in counts.items():
+        node = tree
+        node['count'] += count
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'count': 0, 'children': {}})
+            node['count'] += count
+
+    total = tree['count'] or 1
+    rects = []
+    max_depth = 0
+
+    def walk(node, x: float, depth: int):
+        nonlocal max_depth
+        max_depth = max(max_depth, depth)
+        for name, child in sorted(node['children'].items()):
+            w = child['count'] / total * width
+            if w >= 0.5:
+                rects.append((x, depth, w, name, child['count']))
+                walk(child, x, depth + 1)
+            x += w
+
+    walk(tree, 0.0, 0)
+    height = (max_depth + 2) * row_height
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">',
+             f'<text x="4" y="12">{escape(title)} ({total} samples)</text>']
+    for x, depth, w, name, count in rects:
+        y = height - (depth + 1) * row_height
+        hue = 20 + (hash(name) % 40)
+        label = escape(name[:int(w / 7)]) if w > 21 else ''
+        parts.append(f'<g><title>{escape(name)} ({count} samples, {count / total:.1%})</title>'
+                     f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+                     f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{label}</text></g>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def write_flamegraph(counts: Counter, name: str) -> Tuple[str, str]:
+    """写出折叠栈文件和SVG火焰图，返回两个文件路径"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # 毫秒+进程号+随机后缀：同一秒内对同一路由的多次剖析（包括不同worker进程）不会互相覆盖
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now * 1000) % 1000:03d}"
+    base = os.path.join(PROFILE_DIR, f"{stamp}_{os.getpid()}_{uuid.uuid4().hex[:8]}_{name}")
+    folded_path, svg_path = f"{base}.folded", f"{base}.svg"
+    with open(folded_path, 'w', encoding='utf-8') as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(svg_path, 'w', encoding='utf-8') as f:
+        f.write(_render_flamegraph_svg(counts, name))
+    return folded_path, svg_path
+
+
+class LoopBlockingDetector:
+    """事件循环阻塞检测
+
+    事件循环中每隔一小段时间执行一次心跳回调，独立的看门狗线程检查心跳间隔；
+    超过阈值说明某个协程步骤（例如同步的requests.get或文件读写）占住了事件循环，
+    此时抓取事件循环线程的当前调用栈并记录日志，每次阻塞只报告一次。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float):
+        self.loop = loop
+        self.threshold = threshold
+        self.check_interval = max(threshold / 4, 0.005)
+        self.loop_thread_id = threading.get_ident()
+        self.blocked_count = 0
+        self._last_tick = time.monotonic()
+        self._tick_seq = 0
+        self._reported_seq = -1
+        self._handle = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        """必须在事件循环线程内调用"""
+        self._tick()
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle:
+            self._handle.cancel()
+
+    def _tick(self):
+        self._last_tick = time.monotonic()
+        self._tick_seq += 1
+        self._handle = self.loop.call_later(self.check_interval, self._tick)
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            lag = time.monotonic() - self._last_tick - self.check_interval
+            seq = self._tick_seq
+            if lag > self.threshold and seq != self._reported_seq:
+                self._reported_seq = seq
+                self.blocked_count += 1
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stack = ''.join(traceback.format_stack(frame)) if frame else '（无法获取调用栈）'
+                logger.warning(f"事件循环被阻塞超过 {lag * 1000:.0f}ms，阻塞位置:\n{stack}")
+
+
+def run_coroutine(coro: Awaitable, block_threshold: Optional[float] = None):
+    """asyncio.run 的替代：配置了阈值时（参数或 LOOP_BLOCK_THRESHOLD_MS）附带事件循环阻塞检测"""
+    if block_threshold is None and os.getenv('LOOP_BLOCK_THRESHOLD_MS'):
+        block_threshold = float(os.getenv('LOOP_BLOCK_THRESHOLD_MS')) / 1000
+    if not block_threshold:
+        return asyncio.run(coro)
+
+    async def watched():
+        detector = LoopBlockingDetector(asyncio.get_running_loop(), block_threshold)
+        detector.start()
+        try:
+            return await coro
+        finally:
+            detector.stop()
+
+    return asyncio.run(watched())
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS_PATH = os.path.join(os.path.dirname(__file__), 'prompts.json')
+
+
+def load_prompts(prompts_path: str = DEFAULT_PROMPTS_PATH) -> Dict[str, Any]:
+    """从prompts.json文件加载提示词配置"""
+    with open(prompts_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@dataclass
+class _Snapshot:
+    """某一版本prompts.json对应的提示词及编译结果（只增不改，整体替换）"""
+    prompts: Dict[str, Any]
+    mtime: Optional[float]
+    templates: Dict[Tuple[str, str], Any] = field(default_factory=dict)
+    chains: Dict[Tuple, Any] = field(default_factory=dict)
+
+
+class PromptRegistry:
+    """提示词/链注册表
+
+    每个智能体的ChatPromptTemplate和 prompt | llm | parser 链只编译一次并跨请求复用；
+    访问时按间隔检查prompts.json的修改时间，文件变化后重新编译并整体替换快照，
+    正在执行的请求继续使用旧快照，不需要重启worker即可调整提示词。
+    """
+
+    def __init__(self, prompts_path: str = DEFAULT_PROMPTS_PATH, check_interval: float = 2.0):
+        self.prompts_path = prompts_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._format_instructions: Dict[int, str] = {}
+        self._snapshot = _Snapshot(prompts={}, mtime=None)
+        self._reload()
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.prompts_path).st_mtime
+        except OSError:
+            return None
+
+    def _reload(self):
+        """重新读取并编译提示词，失败时保留旧版本"""
+        mtime = self._current_mtime()
+        try:
+            prompts = load_prompts(self.prompts_path)
+        except Exception as e:
+            logger.error(f"加载提示词配置失败: {e}")
+            return
+
+        snapshot = _Snapshot(prompts=prompts, mtime=mtime)
+        try:
+            from langchain.prompts import ChatPromptTemplate
+            for agent_name, agent_prompts in prompts.items():
+                for key, template in agent_prompts.items():
+                    if key.endswith('_template'):
+                        snapshot.templates[(agent_name, key)] = ChatPromptTemplate.from_template(template)
+        except Exception as e:
+            logger.error(f"编译提示词模板失败，继续使用旧版本: {e}")
+            return
+
+        # 引用替换在GIL下是原子的，读取方要么拿到旧快照要么拿到新快照
+        self._snapshot = snapshot
+        logger.info(f"提示词配置已加载: {self.prompts_path}")
+
+    def _maybe_reload(self) -> _Snapshot:
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            with self._lock:
+                if now - self._last_check >= self.check_interval:
+                    self._last_check = now
+                    if self._current_mtime() != self._snapshot.mtime:
+                        self._reload()
+        return self._snapshot
+
+    @property
+    def prompts(self) -> Dict[str, Any]:
+        """当前版本的原始提示词配置"""
+        return self._maybe_reload().prompts
+
+    def get_template(self, agent_name: str, key: str, default: str = '') -> str:
+        """获取原始模板字符串"""
+        return self.prompts.get(agent_name, {}).get(key, default)
+
+    def get_prompt(self, agent_name: str, key: str, default: str = ''):
+        """获取编译好的ChatPromptTemplate，配置缺失时使用default编译"""
+        snapshot = self._maybe_reload()
+        prompt = snapshot.templates.get((agent_name, key))
+        if prompt is None:
+            from langchain.prompts import ChatPromptTemplate
+            prompt = snapshot.templates.setdefault((agent_name, key), ChatPromptTemplate.from_template(default))
+        return prompt
+
+    def get_chain(self, agent_name: str, key: str, default: str, llm, parser=None):
+        """获取 prompt | llm | parser 链，按 (智能体, 模板, 模型, 解析器) 缓存"""
+        snapshot = self._maybe_reload()
+        cache_key = (agent_name, key, id(llm), id(parser))
+        chain = snapshot.chains.get(cache_key)
+        if chain is None:
+            chain = self.get_prompt(agent_name, key, default) | llm
+            if parser is not None:
+                chain = chain | parser
+            chain = snapshot.chains.setdefault(cache_key, chain)
+        return chain
+
+    def get_format_instructions(self, parser) -> str:
+        """获取解析器的格式说明，每个解析器只生成一次"""
+        instructions = self._format_instructions.get(id(parser))
+        if instructions is None:
+            instructions = self._format_instructions.setdefault(id(parser), parser.get_format_instructions())
+        return instructions
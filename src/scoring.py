@@ -0,0 +1,139 @@
+"""本地确定性评分
+
+活跃度、代码质量和维护状态都可以由已有的项目数据直接算出，不需要调用大模型：
+结果立即可得、同样的输入永远得到同样的分数，并且可以在整个结果集上向量化计算。
+
+用法（批量重新评分已保存的项目记录）:
+    python -m src.scoring "React UI components" "Vue UI components"
+"""
+import os
+import sys
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.corpus_stats import parse_github_time, parse_number
+from src.shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+# 评分公式变化时递增，记录中保存版本号便于判断是否需要重新评分
+SCORING_VERSION = 1
+
+# 维护状态阈值：距最近一次推送的天数
+ACTIVE_DAYS = 90
+STALE_DAYS = 365
+
+# 代码质量各项信号的分值，合计10分
+QUALITY_WEIGHTS = {
+    'has_readme': 2.5,
+    'readme_length': 1.5,
+    'has_requirements_txt': 1.5,
+    'has_dockerfile': 1.5,
+    'license': 1.5,
+    'description': 1.0,
+    'topics': 0.5
+}
+
+
+def _column(records: List[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.array([parse_number(record.get(key)) for record in records], dtype=np.float64)
+
+
+def _flag(records: List[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.array([bool(record.get(key)) for record in records], dtype=np.float64)
+
+
+def _length(records: List[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.array([len(record.get(key) or '') for record in records], dtype=np.float64)
+
+
+def score_projects(records: List[Dict[str, Any]], now: Optional[np.datetime64] = None) -> List[Dict[str, Any]]:
+    """为一组项目计算 activity_score / code_quality_score / maintenance_status
+
+    - 活跃度：最近推送时间（半衰约4个月）占60%，star数（对数）占25%，fork数（对数）占15%
+    - 代码质量：README及其篇幅、requirements.txt、Dockerfile、许可证、描述、主题标签的加权和
+    - 维护状态：90天内有推送为"活跃"，一年内为"一般"，更久为"停滞"；缺少时间信息时为"一般"
+    """
+    if not records:
+        return []
+    now = now if now is not None else np.datetime64('now', 's')
+
+    # 优先使用pushed_at（代码推送时间），旧记录只有last_commit（仓库更新时间）
+    pushed = np.array([parse_github_time(record.get('pushed_at') or record.get('last_commit')) for record in records],
+                      dtype='datetime64[s]')
+    days_since_push = (now - pushed) / np.timedelta64(1, 'D')
+    has_date = ~np.isnan(days_since_push)
+    recency = np.where(has_date, np.exp(-np.clip(np.nan_to_num(days_since_push), 0, None) / 180), 0.0)
+
+    stars = np.nan_to_num(_column(records, 'stars'))
+    forks = np.nan_to_num(_column(records, 'forks'))
+    popularity = np.clip(np.log10(np.clip(stars, 0, None) + 1) / 5, 0, 1)   # 10万star满分
+    community = np.clip(np.log10(np.clip(forks, 0, None) + 1) / 4, 0, 1)    # 1万fork满分
+    activity = 10 * (0.6 * recency + 0.25 * popularity + 0.15 * community)
+
+    quality = (
+        QUALITY_WEIGHTS['has_readme'] * _flag(records, 'has_readme')
+        + QUALITY_WEIGHTS['readme_length'] * np.clip(_length(records, 'readme_content') / 1500, 0, 1)
+        + QUALITY_WEIGHTS['has_requirements_txt'] * _flag(records, 'has_requirements_txt')
+        + QUALITY_WEIGHTS['has_dockerfile'] * _flag(records, 'has_dockerfile')
+        + QUALITY_WEIGHTS['license'] * _flag(records, 'license')
+        + QUALITY_WEIGHTS['description'] * np.clip(_length(records, 'description') / 20, 0, 1)
+        + QUALITY_WEIGHTS['topics'] * np.clip(
+            np.array([len(record.get('topics') or []) for record in records], dtype=np.float64) / 3, 0, 1)
+    )
+
+    status = np.select(
+        [~has_date, days_since_push <= ACTIVE_DAYS, days_since_push <= STALE_DAYS],
+        ['一般', '活跃', '一般'], default='停滞')
+
+    return [{
+        'activity_score': round(float(a), 1),
+        'code_quality_score': round(float(q), 1),
+        'maintenance_status': str(s)
+    } for a, q, s in zip(activity, quality, status)]
+
+
+def rescore_query(store: SharedStore, query: str) -> int:
+    """按当前公式重新计算查询下所有项目记录的评分，返回更新的记录数
+
+    只更新 analysis_result 中的三个评分字段，大模型给出的技术栈和复杂度保持不变。
+    """
+    directory = store.query_dir(query)
+    try:
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.endswith('.json') and not name.startswith('.'))
+    except FileNotFoundError:
+        return 0
+
+    records, record_paths = [], []
+    for path in paths:
+        try:
+            record = store.read_json(path)
+        except Exception as e:
+            logger.warning(f"跳过无法解析的项目记录 {path}: {e}")
+            continue
+        if isinstance(record, dict) and record.get('analysis_result'):
+            records.append(record)
+            record_paths.append(path)
+
+    updated = 0
+    for path, scores in zip(record_paths, score_projects(records)):
+        def apply(data: Dict[str, Any]):
+            if data.get('analysis_result'):
+                data['analysis_result'].update(scores)
+                data['scoring_version'] = SCORING_VERSION
+        if store.update_json(path, apply) is not None:
+            updated += 1
+    return updated
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print('用法: python -m src.scoring <查询> [<查询> ...]', file=sys.stderr)
+        sys.exit(1)
+    shared_store = SharedStore()
+    for query_arg in sys.argv[1:]:
+        print(f"{query_arg}: 已重新评分 {rescore_query(shared_store, query_arg)} 个项目")
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional, Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，退化为进程内锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LockTimeout(Exception):
+    """等待跨进程锁超时"""
+
+
+class SharedStore:
+    """多worker共享的项目存储
+
+    所有worker进程（以及挂载同一目录的其他节点）通过同一个根目录共享项目记录：
+    - 写入使用临时文件 + os.replace，读方永远不会看到写了一半的JSON
+    - 记录更新和耗时任务通过 flock 文件锁串行化，锁文件放在 <root>/.locks 下
+    - work key 保证同一项工作只被一个worker执行，其余worker等待后直接复用结果
+    """
+
+    def __init__(self, root: Optional[str] = None, lock_poll_interval: float = 0.2):
+        self.root = root or os.getenv('SHARED_STORE_DIR', './auto_search')
+        self.lock_dir = os.path.join(self.root, '.locks')
+        self.lock_poll_interval = lock_poll_interval
+        self._local_locks: Dict[str, threading.Lock] = {}
+        self._local_locks_guard = threading.Lock()
+        os.makedirs(self.lock_dir, exist_ok=True)
+        if fcntl is None:
+            logger.warning("当前平台不支持fcntl，共享存储锁仅在单进程内有效")
+
+    @staticmethod
+    def safe_query(query: str) -> str:
+        return query.replace('/', '_').replace('\\', '_').replace(':', '_')
+
+    def query_dir(self, query: str) -> str:
+        return os.path.join(self.root, self.safe_query(query))
+
+    def project_path(self, query: str, repo_name: str) -> str:
+        """项目记录文件路径: <root>/<query>/<owner>_<repo>.json"""
+        safe_repo_name = repo_name.replace('/', '_')
+        return os.path.join(self.query_dir(query), f"{safe_repo_name}.json")
+
+    def read_json(self, path: str) -> Optional[Dict[str, Any]]:
+        """读取JSON记录，文件不存在时返回None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_json(self, path: str, data: Dict[str, Any]):
+        """原子写入JSON记录"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def update_json(self, path: str, mutate: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                    create: bool = False) -> Optional[Dict[str, Any]]:
+        """在记录锁内读取-修改-写回，返回写入后的数据；记录不存在且create=False时返回None"""
+        with self.lock(f"record:{os.path.abspath(path)}"):
+            data = self.read_json(path)
+            if data is None:
+                if not create:
+                    return None
+                data = {}
+            result = mutate(data)
+            data = data if result is None else result
+            self.write_json(path, data)
+            return data
+
+    def _lock_path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def _local_lock(self, key: str) -> threading.Lock:
+        with self._local_locks_guard:
+            return self._local_locks.setdefault(key, threading.Lock())
+
+    def _try_acquire(self, key: str):
+        """尝试非阻塞获取锁，成功返回释放函数，失败返回None"""
+        if fcntl is None:
+            lock = self._local_lock(key)
+            return lock.release if lock.acquire(blocking=False) else None
+
+        fd = os.open(self._lock_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+        def release():
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        return release
+
+    @contextmanager
+    def lock(self, key: str, timeout: Optional[float] = None):
+        """跨进程互斥锁（同步版本）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            release = self._try_acquire(key)
+            if release:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(f"等待锁超时: {key}")
+            time.sleep(self.lock_poll_interval)
+        try:
+            yield
+        finally:
+            release()
+
+    @asynccontextmanager
+    async def alock(self, key: str, timeout: Optional[float] = None):
+        """跨进程互斥锁（异步版本），等待期间不阻塞事件循环"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            release = self._try_acquire(key)
+            if release:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(f"等待锁超时: {key}")
+            await asyncio.sleep(self.lock_poll_interval)
+        try:
+            yield
+        finally:
+            release()
+
+    async def run_once(self, work_key: str, load_result: Callable[[], Optional[Any]],
+                       compute: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """幂等执行: 持有work key锁后先检查结果是否已由其他worker产出，没有才真正计算"""
+        result = await asyncio.to_thread(load_result)
+        if result is not None:
+            return result
+        async with self.alock(f"work:{work_key}", timeout=timeout):
+            result = await asyncio.to_thread(load_result)
+            if result is not None:
+                logger.info(f"复用其他worker的结果: {work_key}")
+                return result
+            return await compute()
@@ -0,0 +1,176 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from src.prompt_registry import PromptRegistry
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_OUTPUT_MODES = ('function', 'json', 'parser')
+
+
+def _model_name(llm) -> str:
+    return getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or 'unknown'
+
+
+def _strip_json(text: str) -> str:
+    """去掉markdown代码块等包装，只保留最外层的JSON对象"""
+    start, end = text.find('{'), text.rfind('}')
+    return text[start:end + 1] if start != -1 and end > start else text
+
+
+class StructuredOutputChain:
+    """让大模型直接返回Pydantic模型
+
+    - function: 通过工具调用（tools/tool_choice）返回参数，提示词里不再需要冗长的JSON schema
+    - json: JSON模式（response_format=json_object），提示词里只附一行字段说明
+    - parser: 旧方式，提示词附带PydanticOutputParser的格式说明，从文本中解析
+    解析失败时自动带上错误信息重试一次，并按模型统计解析失败率。
+    """
+
+    def __init__(self, model_cls: Type[BaseModel], prompt_registry: PromptRegistry,
+                 agent_name: str, template_key: str, default_template: str, mode: Optional[str] = None):
+        self.model_cls = model_cls
+        self.prompt_registry = prompt_registry
+        self.agent_name = agent_name
+        self.template_key = template_key
+        self.default_template = default_template
+        self.mode = mode or os.getenv('STRUCTURED_OUTPUT', 'function')
+        if self.mode not in STRUCTURED_OUTPUT_MODES:
+            logger.warning(f"未知的STRUCTURED_OUTPUT模式 {self.mode}，使用function")
+            self.mode = 'function'
+        self._bound: Dict[int, Any] = {}
+        self._parser = None
+        self._format_instructions: Optional[str] = None
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'parse_failures': 0, 'repaired': 0, 'repair_failures': 0}
+        # 按实际返回结果的模型分别计数（备用模型返回的结果计入备用模型）
+        self.model_stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def function_schema(self) -> Dict[str, Any]:
+        return {
+            'name': self.model_cls.__name__,
+            'description': (self.model_cls.__doc__ or '').strip(),
+            'parameters': self.model_cls.model_json_schema()
+        }
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            from langchain.output_parsers import PydanticOutputParser
+            self._parser = PydanticOutputParser(pydantic_object=self.model_cls)
+        return self._parser
+
+    @property
+    def format_instructions(self) -> str:
+        """填入模板 {format_instructions} 的内容"""
+        if self._format_instructions is None:
+            if self.mode == 'function':
+                self._format_instructions = f"请调用函数 {self.model_cls.__name__} 返回结果。"
+            elif self.mode == 'json':
+                fields = {name: field.description or '' for name, field in self.model_cls.model_fields.items()}
+                self._format_instructions = "只返回一个JSON对象，字段如下: " + json.dumps(fields, ensure_ascii=False)
+            else:
+                self._format_instructions = self.prompt_registry.get_format_instructions(self.parser)
+        return self._format_instructions
+
+    @property
+    def parse_failure_rate(self) -> float:
+        return self.stats['parse_failures'] / self.stats['calls'] if self.stats['calls'] else 0.0
+
+    def _record(self, model: str, key: str):
+        with self._lock:
+            self.stats[key] += 1
+            counts = self.model_stats.setdefault(model, dict.fromkeys(self.stats, 0))
+            counts[key] += 1
+
+    def stats_by_model(self) -> Dict[str, Dict[str, Any]]:
+        """各模型的调用数、解析失败、修复情况和解析失败率"""
+        with self._lock:
+            return {model: {**counts, 'parse_failure_rate': round(
+                        counts['parse_failures'] / counts['calls'], 4) if counts['calls'] else 0.0}
+                    for model, counts in self.model_stats.items()}
+
+    def bind(self, llm):
+        """为模型绑定工具调用或JSON模式参数，每个模型实例只绑定一次"""
+        if self.mode == 'parser':
+            return llm
+        bound = self._bound.get(id(llm))
+        if bound is None:
+            if self.mode == 'function':
+                bound = llm.bind(tools=[{'type': 'function', 'function': self.function_schema}],
+                                 tool_choice={'type': 'function', 'function': {'name': self.model_cls.__name__}})
+            else:
+                bound = llm.bind(response_format={'type': 'json_object'})
+            with self._lock:
+                bound = self._bound.setdefault(id(llm), bound)
+        return bound
+
+    def parse(self, message) -> BaseModel:
+        """从模型返回的消息中解析出Pydantic模型"""
+        if self.mode == 'parser':
+            return self.parser.parse(message.content)
+
+        additional_kwargs = getattr(message, 'additional_kwargs', None) or {}
+        arguments = (additional_kwargs.get('function_call') or {}).get('arguments')
+        if arguments is None and additional_kwargs.get('tool_calls'):
+            arguments = additional_kwargs['tool_calls'][0].get('function', {}).get('arguments')
+        if arguments is None:
+            arguments = _strip_json(message.content or '')
+        return self.model_cls.model_validate_json(arguments)
+
+    @staticmethod
+    def _raw_output(message) -> str:
+        additional_kwargs = getattr(message, 'additional_kwargs', None) or {}
+        if additional_kwargs.get('tool_calls'):
+            return additional_kwargs['tool_calls'][0].get('function', {}).get('arguments', '')
+        if additional_kwargs.get('function_call'):
+            return additional_kwargs['function_call'].get('arguments', '')
+        return message.content or ''
+
+    async def run(self, router, role: str, inputs: Dict[str, Any]) -> BaseModel:
+        """调用模型并解析结果；解析失败时自动修复一次，仍失败则抛出异常由调用方降级"""
+        inputs = {**inputs, 'format_instructions': self.format_instructions}
+        # 记录最后一次被调用的模型，即返回结果的模型（主模型失败后会依次尝试备用模型）
+        answered = {}
+
+        def invoke(llm):
+            answered['model'] = _model_name(llm)
+            return self.prompt_registry.get_chain(
+                self.agent_name, self.template_key, self.default_template, self.bind(llm)).ainvoke(inputs)
+
+        message = await router.run(role, invoke)
+        self._record(answered['model'], 'calls')
+        try:
+            return self.parse(message)
+        except Exception as e:
+            self._record(answered['model'], 'parse_failures')
+            logger.warning(f"{self.model_cls.__name__} 解析失败（模型 {answered['model']}，总失败率 "
+                           f"{self.parse_failure_rate:.1%}），尝试修复: {e}")
+            error = e
+
+        from langchain.schema import AIMessage, HumanMessage
+        prompt = self.prompt_registry.get_prompt(self.agent_name, self.template_key, self.default_template)
+        repair_messages = prompt.format_messages(**inputs) + [
+            AIMessage(content=self._raw_output(message)),
+            HumanMessage(content=f"上面的输出无法解析为 {self.model_cls.__name__}: {error}\n"
+                                 f"请修正后重新返回完整结果。{self.format_instructions}")
+        ]
+
+        def invoke_repair(llm):
+            answered['model'] = _model_name(llm)
+            return self.bind(llm).ainvoke(repair_messages)
+
+        message = await router.run(role, invoke_repair)
+        try:
+            result = self.parse(message)
+        except Exception:
+            self._record(answered['model'], 'repair_failures')
+            raise
+        self._record(answered['model'], 'repaired')
+        return result
@@ -0,0 +1,44 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些依赖必须在首次使用时才导入，不能出现在启动路径上
+HEAVY_MODULES = ('langchain', 'langchain_openai', 'requests', 'numpy')
+
+# 导入main的总耗时上限（微秒），留有余量以适应较慢的CI机器
+IMPORT_BUDGET_US = 1_500_000
+
+
+def _run_python(code, tmp_path, *args):
+    env = dict(os.environ, SHARED_STORE_DIR=str(tmp_path / 'store'), JOB_DB_PATH=str(tmp_path / 'jobs.db'))
+    return subprocess.run([sys.executable, *args, '-c', code], cwd=REPO_ROOT, env=env,
+                          capture_output=True, text=True, timeout=120)
+
+
+@pytest.fixture(autouse=True)
+def _require_flask():
+    pytest.importorskip('flask')
+
+
+def test_main_import_does_not_load_heavy_dependencies(tmp_path):
+    code = (
+        "import sys, main\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = _run_python(code, tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '', f"启动时导入了重量级依赖: {result.stdout.strip()}"
+
+
+def test_main_import_time_within_budget(tmp_path):
+    result = _run_python('import main', tmp_path, '-X', 'importtime')
+    assert result.returncode == 0, result.stderr
+    # -X importtime 输出格式: "import time: self [us] | cumulative | imported package"
+    match = re.search(r'^import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*main$', result.stderr, re.MULTILINE)
+    assert match, result.stderr[-2000:]
+    assert int(match.group(1)) < IMPORT_BUDGET_US, f"导入main耗时 {int(match.group(1)) / 1000:.0f}ms"
@@ -0,0 +1,134 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.job_queue import JobQueue
+
+
+async def _noop(payload, progress):
+    return {}
+
+
+def _make_queue(db_path, owner, **kwargs):
+    queue = JobQueue(db_path=str(db_path), workers=1, **kwargs)
+    queue.owner = owner
+    queue.register('noop', _noop)
+    return queue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / 'jobs.db'
+
+
+def test_expired_lease_is_claimed_by_another_worker(db_path):
+    first = _make_queue(db_path, 'host-a:1', lease_seconds=0.2)
+    second = _make_queue(db_path, 'host-b:1', lease_seconds=0.2)
+    job = first.submit('noop', {})
+
+    claimed = first._claim()
+    assert claimed['id'] == job['job_id'] and claimed['owner'] == 'host-a:1'
+    # 租约有效期内其他worker领不到
+    assert second._claim() is None
+
+    time.sleep(0.3)
+    reclaimed = second._claim()
+    assert reclaimed['id'] == job['job_id']
+    assert reclaimed['owner'] == 'host-b:1'
+    assert reclaimed['attempts'] == 2
+
+
+def test_late_failure_from_previous_owner_is_discarded(db_path):
+    first = _make_queue(db_path, 'host-a:1', lease_seconds=0.1)
+    second = _make_queue(db_path, 'host-b:1', lease_seconds=0.1)
+    job_id = first.submit('noop', {})['job_id']
+    first._claim()
+    time.sleep(0.2)
+    second._claim()
+
+    # 租约已被接管，原worker迟到的失败不能覆盖新worker的执行
+    first._finish(job_id, 'failed', error='late failure')
+    assert first.get(job_id)['status'] == 'running'
+
+    second._finish(job_id, 'succeeded', result={'value': 2})
+    # 已成功的任务不会再被任何worker改写
+    first._finish(job_id, 'failed', error='late failure')
+    job = first.get(job_id)
+    assert job['status'] == 'succeeded' and job['result'] == {'value': 2}
+
+
+def test_late_success_from_previous_owner_is_kept(db_path):
+    first = _make_queue(db_path, 'host-a:1', lease_seconds=0.1)
+    second = _make_queue(db_path, 'host-b:1', lease_seconds=0.1)
+    job_id = first.submit('noop', {})['job_id']
+    first._claim()
+    time.sleep(0.2)
+    second._claim()
+
+    # 成功结果即使租约已被接管也保留，新worker随后的失败不会覆盖它
+    first._finish(job_id, 'succeeded', result={'value': 1})
+    second._finish(job_id, 'failed', error='retry failed')
+    job = first.get(job_id)
+    assert job['status'] == 'succeeded' and job['result'] == {'value': 1}
+
+
+def test_duplicate_submit_returns_active_job(db_path):
+    queue = _make_queue(db_path, 'host-a:1')
+    job = queue.submit('noop', {}, work_key='same')
+    assert queue.submit('noop', {}, work_key='same')['job_id'] == job['job_id']
+
+    queue._claim()
+    queue._finish(job['job_id'], 'succeeded', result={})
+    # 已结束的任务不再合并，重新提交会创建新任务
+    assert queue.submit('noop', {}, work_key='same')['job_id'] != job['job_id']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="Windows 上只依赖租约过期恢复")
+def test_orphaned_job_of_exited_process_is_requeued(db_path):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    orphan_owner = f"{socket.gethostname()}:{exited.pid}"
+
+    crashed = _make_queue(db_path, orphan_owner, lease_seconds=600)
+    job_id = crashed.submit('noop', {})['job_id']
+    crashed._claim()
+
+    restarted = _make_queue(db_path, f"{socket.gethostname()}:{os.getpid()}", lease_seconds=600)
+    restarted._recover_orphans()
+    assert restarted.get(job_id)['status'] == 'queued'
+    assert restarted._claim()['id'] == job_id
+
+
+def test_progress_events_are_written_before_completion(db_path):
+    async def handler(payload, progress):
+        for i in range(3):
+            progress(f"step {i}")
+        return {'done': True}
+
+    queue = JobQueue(db_path=str(db_path), workers=1, poll_interval=0.05)
+    queue.register('steps', handler)
+    # 放慢进度写入线程，未等进度落库就写最终状态时事件顺序会错乱
+    add_event = queue._add_event
+
+    def slow_add_event(job_id, message):
+        if message.startswith('step'):
+            time.sleep(0.05)
+        add_event(job_id, message)
+
+    queue._add_event = slow_add_event
+    queue.start()
+    try:
+        job_id = queue.submit('steps', {})['job_id']
+        deadline = time.monotonic() + 10
+        while queue.get(job_id)['status'] != 'succeeded':
+            assert time.monotonic() < deadline, queue.get(job_id)
+            time.sleep(0.05)
+    finally:
+        queue.stop()
+
+    messages = [event['message'] for event in queue.events(job_id)]
+    assert messages[-4:] == ['step 0', 'step 1', 'step 2', '任务完成']
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.llm_executor import AdaptiveLimiter, LLMExecutor
+
+
+def test_cancelled_waiter_returns_slot():
+    limiter = AdaptiveLimiter(1)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # 立即离开等待队列，不会挡住之后的 try_acquire
+        assert not limiter._waiters
+        limiter.release()
+        # 被取消的等待者不应占着名额，下一个调用方可以立即拿到
+        await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release()
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+    assert not limiter._waiters
+
+
+def test_waiter_cancelled_after_grant_returns_slot():
+    limiter = AdaptiveLimiter(1)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # release 已把名额交给等待者（回调尚未执行），紧接着等待被取消
+        limiter.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_waiter_cancelled_after_wakeup_returns_slot():
+    limiter = AdaptiveLimiter(1)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()
+        # 让分配名额的回调先执行（future已有结果），等待者恢复执行之前被取消
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_release_wakes_waiter_on_another_loop():
+    limiter = AdaptiveLimiter(1)
+    acquired = threading.Event()
+    result = {}
+
+    async def hold():
+        await limiter.acquire()
+        acquired.set()
+        await asyncio.sleep(0.1)
+        limiter.release()
+
+    def other_loop():
+        async def wait():
+            started = time.monotonic()
+            await asyncio.wait_for(limiter.acquire(), 5)
+            result['waited'] = time.monotonic() - started
+            limiter.release()
+        asyncio.run(wait())
+
+    async def scenario():
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        assert acquired.is_set()
+        thread = threading.Thread(target=other_loop)
+        thread.start()
+        await holder
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(scenario())
+    assert 0.05 <= result['waited'] < 1
+    assert limiter.in_flight == 0
+
+
+def test_concurrency_never_exceeds_limit_across_loops():
+    limiter = AdaptiveLimiter(2)
+    peak = []
+    lock = threading.Lock()
+
+    async def work():
+        await limiter.acquire()
+        try:
+            with lock:
+                peak.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+        finally:
+            limiter.release()
+
+    def run_loop():
+        async def main():
+            await asyncio.gather(*(work() for _ in range(10)))
+        asyncio.run(main())
+
+    threads = [threading.Thread(target=run_loop) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(peak) == 30
+    assert max(peak) <= 2
+    assert limiter.in_flight == 0
+
+
+def test_deadline_caps_retries():
+    executor = LLMExecutor(max_concurrency=1, max_retries=10, timeout=0.2, total_timeout=0.5,
+                           base_delay=0.01, max_delay=0.01)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(executor.run(hang))
+    assert time.monotonic() - started < 1.5
+    assert executor.stats['retries'] < 10
+
+
+def test_queue_timeout_is_not_reported_as_attempt():
+    executor = LLMExecutor(max_concurrency=1, max_retries=0, timeout=5, total_timeout=5)
+    attempts = []
+
+    async def scenario():
+        await executor.limiter.acquire()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await executor.run(lambda: asyncio.sleep(0), deadline=time.monotonic() + 0.1,
+                                   on_attempt=attempts.append)
+        finally:
+            executor.limiter.release()
+
+    asyncio.run(scenario())
+    # 一直在本地排队，没有请求发给模型
+    assert attempts == []